@@ -1,11 +1,25 @@
 import tkinter as tk
 from tkinter import ttk
 import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
 import threading
 import time
-import json
 import argparse
 
+# orjson заметно быстрее stdlib json; если не установлен - используем json
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
 class TelemetryApp:
     def __init__(self, root, api_url, interval):
         self.root = root
@@ -14,6 +28,17 @@ class TelemetryApp:
         self.interval = interval
         self.running = True
 
+        # Полные URL считаем один раз, а не на каждом запросе
+        self._ch_url = f"{self.api_url}/api/v1/channels"
+        self._tel_url = f"{self.api_url}/api/v1/telemetry"
+
+        # Одна Session на оба потока (RC и телеметрия) вместо новой на каждый запрос
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+
         # Данные каналов (16 каналов, центр 1500)
         self.channels = [1500] * 16
         self.channels[0] = 1000 # Throttle в 0 по умолчанию
@@ -36,6 +61,10 @@ class TelemetryApp:
             "Link": tk.StringVar(value="0 %")
         }
         
+        # Последний показанный текст каждой метки и хэш последнего пакета
+        self._tel_text = {}
+        self._last_tel_hash = None
+
         self.status_var = tk.StringVar(value="Подключение...")
         self.status_color = "orange"
 
@@ -95,7 +124,11 @@ class TelemetryApp:
         self.send_rc_command()
 
     def update_channel(self, channel_index, value):
-        self.channels[channel_index] = int(value)
+        value = int(value)
+        # Scale дергает callback на каждый пиксель - без изменения не шлем
+        if self.channels[channel_index] == value:
+            return
+        self.channels[channel_index] = value
         # Ограничение частоты отправки (чтобы не DDOS-ить сервер)
         current_time = time.time()
         if current_time - self.last_send_time > self.send_interval:
@@ -104,19 +137,17 @@ class TelemetryApp:
 
     def send_rc_command(self):
         try:
-            url = f"{self.api_url}/api/v1/channels"
-            headers = {'Content-Type': 'application/json'}
             payload = {"channels": self.channels}
             
             # ВАЖНО: timeout=0.1, чтобы интерфейс не фризился
-            response = requests.post(url, data=json.dumps(payload), headers=headers, timeout=0.1)
+            response = self.session.post(self._ch_url, data=json_dumps(payload), timeout=0.1)
             
             if response.status_code == 200:
                 self.set_status("Connected (TX OK)", "lightgreen")
             else:
                 self.set_status(f"Error TX: {response.status_code}", "salmon")
                 
-        except requests.exceptions.RequestException:
+        except RequestException:
             # Молча обрабатываем ошибку, не блокируя интерфейс окнами
             self.set_status("Connection Lost (TX)", "red")
 
@@ -125,17 +156,29 @@ class TelemetryApp:
         while self.running:
             try:
                 # Тайм-аут важен!
-                response = requests.get(f"{self.api_url}/api/v1/telemetry", timeout=0.2)
+                response = self.session.get(self._tel_url, timeout=0.2)
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    # Обновление GUI должно быть в основном потоке
-                    self.root.after(0, self.update_gui_labels, data)
+                    # Пакет не изменился (частый случай в простое) - не парсим
+                    # и не трогаем метки, только обновляем статус
+                    content_hash = hash(response.content)
+                    if content_hash == self._last_tel_hash:
+                        self.root.after(0, self.set_status, "Connected (Link OK)", "lightgreen")
+                    else:
+                        data = json_loads(response.content)
+                        # Хэш запоминаем только после успешного разбора, иначе
+                        # повтор битого пакета считался бы "без изменений"
+                        self._last_tel_hash = content_hash
+                        # Обновление GUI должно быть в основном потоке
+                        self.root.after(0, self.update_gui_labels, data)
                 else:
-                    self.root.after(0, lambda: self.set_status("Server Error (RX)", "orange"))
+                    self.root.after(0, self.set_status, "Server Error (RX)", "orange")
 
-            except requests.exceptions.RequestException:
-                 self.root.after(0, lambda: self.set_status("Connection Lost (RX)", "red"))
+            except RequestException:
+                 self.root.after(0, self.set_status, "Connection Lost (RX)", "red")
+            except ValueError:
+                # Битый или пустой JSON не должен останавливать поток телеметрии
+                self.root.after(0, self.set_status, "Invalid Data (RX)", "orange")
             
             time.sleep(self.interval)
 
@@ -145,33 +188,41 @@ class TelemetryApp:
             self.set_status("Connected (Link OK)", "lightgreen")
             
             # Безопасное извлечение данных (если ключа нет, будет N/A)
-            self.telemetry_vars["Voltage"].set(f"{data.get('voltage', 0):.1f} V")
-            self.telemetry_vars["Current"].set(f"{data.get('current', 0):.1f} A")
-            self.telemetry_vars["Altitude"].set(f"{data.get('altitude', 0):.1f} m")
-            self.telemetry_vars["Attitude"].set(
+            self._set_tel("Voltage", f"{data.get('voltage', 0):.1f} V")
+            self._set_tel("Current", f"{data.get('current', 0):.1f} A")
+            self._set_tel("Altitude", f"{data.get('altitude', 0):.1f} m")
+            self._set_tel(
+                "Attitude",
                 f"P:{data.get('pitch', 0):.0f} R:{data.get('roll', 0):.0f} Y:{data.get('yaw', 0):.0f}"
             )
             
             gps = data.get('gps', {})
-            self.telemetry_vars["GPS"].set(f"{gps.get('lat', 0):.4f}, {gps.get('lon', 0):.4f}")
-            self.telemetry_vars["Satellite"].set(str(gps.get('satellites', 0)))
+            self._set_tel("GPS", f"{gps.get('lat', 0):.4f}, {gps.get('lon', 0):.4f}")
+            self._set_tel("Satellite", str(gps.get('satellites', 0)))
             
             # Обработка статистики линка (если есть)
             link = data.get('link_statistics', {})
             uplink_rssi = link.get('uplink_rssi_1', 0)
             lq = link.get('uplink_link_quality', 0)
-            self.telemetry_vars["RSSI"].set(f"{uplink_rssi} dBm")
-            self.telemetry_vars["Link"].set(f"{lq} %")
+            self._set_tel("RSSI", f"{uplink_rssi} dBm")
+            self._set_tel("Link", f"{lq} %")
 
         except Exception as e:
             print(f"Error parsing telemetry: {e}")
 
+    def _set_tel(self, key, text):
+        """Обновление StringVar телеметрии только при изменении текста"""
+        if self._tel_text.get(key) != text:
+            self._tel_text[key] = text
+            self.telemetry_vars[key].set(text)
+
     def set_status(self, text, color):
         self.status_var.set(f"Status: {text}")
         self.status_label.config(bg=color)
 
     def on_close(self):
         self.running = False
+        self.session.close()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -3,75 +3,403 @@
 Тест стабильности API сервера
 """
 
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import sys
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import time
-import statistics
+import math
 
-def test_stability(api_url, duration=10, frequency=20):
+# aiohttp нужен только для режима --async
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+CLOCK_MONOTONIC = 1
+TFD_CLOEXEC = 0o2000000
+TFD_TIMER_ABSTIME = 1
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+class _Itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", _Timespec), ("it_value", _Timespec)]
+
+
+def _timespec(seconds):
+    sec = int(seconds)
+    return _Timespec(sec, int((seconds - sec) * 1e9))
+
+
+class PeriodicTimer:
+    """Периодический таймер без накопления ошибки
+    
+    Дедлайны считаются от абсолютного времени time.monotonic(), поэтому
+    задержка одного цикла не сдвигает последующие. На Linux ожидание идет
+    через timerfd (CLOCK_MONOTONIC), на остальных ОС - через time.sleep
+    с добором остатка по perf_counter.
+    """
+    
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_deadline = time.monotonic() + interval
+        self._fd = None
+        if sys.platform.startswith("linux"):
+            self._fd = self._open_timerfd()
+    
+    def _open_timerfd(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.timerfd_create(CLOCK_MONOTONIC, TFD_CLOEXEC)
+            if fd < 0:
+                return None
+            # Первый дедлайн - абсолютный, далее ядро само взводит таймер с периодом interval
+            spec = _Itimerspec(_timespec(self.interval), _timespec(self.next_deadline))
+            if libc.timerfd_settime(fd, TFD_TIMER_ABSTIME, ctypes.byref(spec), None) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+    
+    def wait(self):
+        """Ждет следующего дедлайна"""
+        if self._fd is not None:
+            # Возвращает число пропущенных срабатываний; при отставании не ждем
+            os.read(self._fd, 8)
+            return
+        
+        remaining = self.next_deadline - time.monotonic()
+        if remaining > 0.002:
+            time.sleep(remaining - 0.001)
+        # Последнюю миллисекунду добираем по perf_counter
+        target = time.perf_counter() + (self.next_deadline - time.monotonic())
+        while time.perf_counter() < target:
+            pass
+        self.next_deadline += self.interval
+    
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class P2Quantile:
+    """Потоковая оценка квантиля алгоритмом P² (Jain & Chlamtac), O(1) памяти"""
+    
+    def __init__(self, q=0.5):
+        self.q = q
+        self._samples = []  # первые 5 значений, пока маркеры не построены
+        self._h = None  # высоты маркеров
+        self._n = [0, 1, 2, 3, 4]  # позиции маркеров
+        self._np = [0.0, 2 * q, 4 * q, 2 + 2 * q, 4.0]  # желаемые позиции
+        self._dn = [0.0, q / 2, q, (1 + q) / 2, 1.0]
+    
+    def add(self, x):
+        h = self._h
+        if h is None:
+            self._samples.append(x)
+            if len(self._samples) == 5:
+                self._h = sorted(self._samples)
+            return
+        
+        # Ячейка, в которую попало значение
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+        
+        n = self._n
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+        
+        # Корректируем средние маркеры
+        for i in (1, 2, 3):
+            d = self._np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                hp = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if not h[i - 1] < hp < h[i + 1]:
+                    # Параболическая оценка вышла за соседей - линейная
+                    hp = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = hp
+                n[i] += d
+    
+    def estimate(self):
+        if self._h is not None:
+            return self._h[2]
+        if not self._samples:
+            return math.nan
+        # Меньше 5 значений - точный квантиль
+        s = sorted(self._samples)
+        pos = self.q * (len(s) - 1)
+        lo = int(pos)
+        hi = min(lo + 1, len(s) - 1)
+        return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+
+class LatencyStats:
+    """Потоковая статистика задержек: min/max, среднее по Уэлфорду и медиана P²"""
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._median = P2Quantile(0.5)
+    
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self._median.add(x)
+    
+    @property
+    def stdev(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+    
+    @property
+    def median(self):
+        return self._median.estimate()
+
+
+def _start_printer(stream):
+    """Поток вывода прогресса: печать не задерживает цикл измерений
+    
+    Возвращает очередь; в нее кладутся кортежи (elapsed, count, successes,
+    failures, tail), None останавливает поток.
+    """
+    log_q = queue.SimpleQueue()
+    
+    def _printer():
+        while True:
+            item = log_q.get()
+            if item is None:
+                break
+            elapsed, count, successes, failures, tail = item
+            print(f"[{elapsed:.1f}с] Отправок: {count}, "
+                  f"Успешно: {successes}, Ошибок: {failures}, {tail}", file=stream)
+    
+    thread = threading.Thread(target=_printer, daemon=True)
+    thread.start()
+    return log_q, thread
+
+
+def _stop_printer(log_q, thread):
+    log_q.put(None)
+    thread.join()
+
+
+def _channel_value(test_count):
+    """Значение CH1 для имитации джойстика на шаге test_count"""
+    if test_count % 10 == 0:
+        return 1000
+    elif test_count % 10 == 5:
+        return 2000
+    return 1500
+
+
+def test_stability(api_url, duration=10, frequency=20, output="text"):
     """Тестирует стабильность API сервера"""
-    print(f"Тест стабильности API: {api_url}")
-    print(f"Длительность: {duration} сек, Частота: {frequency} Гц")
-    print("-" * 60)
+    # В режиме json stdout занят итоговым JSON, текст уходит в stderr
+    stream = sys.stderr if output == "json" else sys.stdout
+    print(f"Тест стабильности API: {api_url}", file=stream)
+    print(f"Длительность: {duration} сек, Частота: {frequency} Гц", file=stream)
+    print("-" * 60, file=stream)
     
-    channels = [1500] * 16
     interval = 1.0 / frequency
+    url = f"{api_url}/api/command/setChannels"
     
-    latencies = []
+    # Тело запроса кодируется один раз, дальше меняются только 4 цифры CH1
+    body = bytearray(b'{"channels":[' + b','.join([b'1500'] * 16) + b']}')
+    ch1_offset = body.index(b'1500')
+    
+    # Одна сессия на весь тест: не создаем Session и пул соединений на каждый запрос
+    session = requests.Session()
+    session.mount(api_url, HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+    session.headers['Content-Type'] = 'application/json'
+    
+    # Статистика считается на лету, отдельные задержки не храним
+    latencies = LatencyStats()
     successes = 0
     failures = 0
     
-    start_time = time.time()
+    # Часы читаются дважды за итерацию: до и после запроса
+    now = time.monotonic
+    start_time = now()
     end_time = start_time + duration
+    timer = PeriodicTimer(interval)
     
     test_count = 0
+    log_q, printer = _start_printer(stream)
     
-    while time.time() < end_time:
-        test_count += 1
-        cycle_start = time.time()
-        
-        # Меняем значение для имитации джойстика
-        if test_count % 10 == 0:
-            channels[0] = 1000
-        elif test_count % 10 == 5:
-            channels[0] = 2000
-        else:
-            channels[0] = 1500
-        
-        try:
-            request_start = time.time()
-            response = requests.post(
-                f"{api_url}/api/command/setChannels",
-                json={"channels": channels},
-                timeout=0.5
-            )
-            request_end = time.time()
+    try:
+        while True:
+            request_start = now()
+            if request_start >= end_time:
+                break
+            test_count += 1
             
-            latency = (request_end - request_start) * 1000  # в мс
-            latencies.append(latency)
+            # Меняем значение для имитации джойстика
+            body[ch1_offset:ch1_offset + 4] = b"%04d" % _channel_value(test_count)
             
-            if response.status_code == 200:
-                successes += 1
-                status = "✓"
-            else:
-                failures += 1
-                status = f"✗ HTTP {response.status_code}"
+            try:
+                response = session.post(
+                    url,
+                    data=bytes(body),
+                    timeout=0.5
+                )
+                request_end = now()
                 
-        except Exception as e:
-            failures += 1
-            status = f"✗ {str(e)[:30]}"
+                latencies.add((request_end - request_start) * 1000.0)  # в мс
+                
+                if response.status_code == 200:
+                    successes += 1
+                    status = "✓"
+                else:
+                    failures += 1
+                    status = f"✗ HTTP {response.status_code}"
+                    
+            except Exception as e:
+                failures += 1
+                status = f"✗ {str(e)[:30]}"
+            
+            # Вывод прогресса (печатает отдельный поток)
+            if test_count % 20 == 0:
+                log_q.put((request_start - start_time, test_count, successes, failures,
+                           f"Последний: {status}"))
+            
+            # Поддерживаем частоту по абсолютным дедлайнам
+            timer.wait()
+    finally:
+        timer.close()
+        session.close()
+        _stop_printer(log_q, printer)
+    
+    return _print_results(test_count, successes, failures, latencies, duration, output)
+
+
+async def _stability_async(api_url, duration, frequency, max_in_flight, log_q):
+    """Открытый цикл нагрузки: запросы уходят по расписанию, не дожидаясь ответов"""
+    url = f"{api_url}/api/command/setChannels"
+    interval = 1.0 / frequency
+    loop = asyncio.get_running_loop()
+    timeout = aiohttp.ClientTimeout(total=0.5)
+    
+    latencies = LatencyStats()
+    counters = {"successes": 0, "failures": 0}
+    
+    async def _worker(session, payload):
+        request_start = loop.time()
+        try:
+            async with session.post(url, json=payload, timeout=timeout) as response:
+                await response.read()
+            latencies.add((loop.time() - request_start) * 1000)  # в мс
+            if response.status == 200:
+                counters["successes"] += 1
+            else:
+                counters["failures"] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            counters["failures"] += 1
+    
+    connector = aiohttp.TCPConnector(limit=max_in_flight, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = []
+        start_time = loop.time()
+        end_time = start_time + duration
+        next_time = start_time
+        test_count = 0
         
-        # Вывод прогресса
-        if test_count % 20 == 0:
-            elapsed = time.time() - start_time
-            print(f"[{elapsed:.1f}с] Отправок: {test_count}, "
-                  f"Успешно: {successes}, Ошибок: {failures}, "
-                  f"Последний: {status}")
+        while loop.time() < end_time:
+            test_count += 1
+            channels = [1500] * 16
+            channels[0] = _channel_value(test_count)
+            tasks.append(asyncio.create_task(_worker(session, {"channels": channels})))
+            
+            # Вывод прогресса
+            if test_count % 20 == 0:
+                in_flight = sum(not t.done() for t in tasks[-max_in_flight * 2:])
+                log_q.put((loop.time() - start_time, test_count, counters["successes"],
+                           counters["failures"], f"В полете: {in_flight}"))
+            
+            next_time += interval
+            await asyncio.sleep(max(0.0, next_time - loop.time()))
         
-        # Поддерживаем частоту
-        cycle_time = time.time() - cycle_start
-        sleep_time = max(0, interval - cycle_time)
-        if sleep_time > 0:
-            time.sleep(sleep_time)
+        await asyncio.gather(*tasks)
+    
+    return test_count, counters["successes"], counters["failures"], latencies
+
+
+def test_stability_async(api_url, duration=10, frequency=20, max_in_flight=8, output="text"):
+    """Тестирует API сервер конвейером параллельных запросов (aiohttp)"""
+    if aiohttp is None:
+        raise RuntimeError("Для режима --async установите aiohttp: pip install aiohttp")
+    
+    stream = sys.stderr if output == "json" else sys.stdout
+    print(f"Тест стабильности API (async, до {max_in_flight} запросов одновременно): {api_url}",
+          file=stream)
+    print(f"Длительность: {duration} сек, Частота: {frequency} Гц", file=stream)
+    print("-" * 60, file=stream)
+    
+    log_q, printer = _start_printer(stream)
+    try:
+        test_count, successes, failures, latencies = asyncio.run(
+            _stability_async(api_url, duration, frequency, max_in_flight, log_q))
+    finally:
+        _stop_printer(log_q, printer)
+    return _print_results(test_count, successes, failures, latencies, duration, output)
+
+
+def _print_results(test_count, successes, failures, latencies, duration, output="text"):
+    """Вывод итоговой статистики теста"""
+    passed = successes > failures * 10  # Успехов должно быть в 10 раз больше ошибок
+    
+    if output == "json":
+        result = {
+            "sent": test_count,
+            "successes": successes,
+            "failures": failures,
+            "duration": duration,
+            "actual_frequency": test_count / duration,
+            "passed": passed,
+        }
+        if latencies.count:
+            result["latency_ms"] = {
+                "min": latencies.min,
+                "max": latencies.max,
+                "mean": latencies.mean,
+                "median": latencies.median,
+                "stdev": latencies.stdev,
+            }
+        json.dump(result, sys.stdout)
+        print()
+        return passed
     
     # Статистика
     print("\n" + "=" * 60)
@@ -80,18 +408,35 @@ def test_stability(api_url, duration=10, frequency=20):
     print(f"Успешно: {successes} ({successes/test_count*100:.1f}%)")
     print(f"Ошибок: {failures} ({failures/test_count*100:.1f}%)")
     
-    if latencies:
+    if latencies.count:
         print(f"\nЗадержки (мс):")
-        print(f"  Минимальная: {min(latencies):.1f}")
-        print(f"  Максимальная: {max(latencies):.1f}")
-        print(f"  Средняя: {statistics.mean(latencies):.1f}")
-        print(f"  Медиана: {statistics.median(latencies):.1f}")
+        print(f"  Минимальная: {latencies.min:.1f}")
+        print(f"  Максимальная: {latencies.max:.1f}")
+        print(f"  Средняя: {latencies.mean:.1f}")
+        print(f"  Медиана: {latencies.median:.1f}")
+        print(f"  Ст. отклонение: {latencies.stdev:.1f}")
     
     print(f"\nФактическая частота: {test_count/duration:.1f} Гц")
     
-    return successes > failures * 10  # Успехов должно быть в 10 раз больше ошибок
+    return passed
 
 if __name__ == "__main__":
-    import sys
-    api_url = sys.argv[1] if len(sys.argv) > 1 else "http://192.168.1.101:8081"
-    test_stability(api_url)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Тест стабильности API сервера")
+    parser.add_argument("api_url", nargs="?", default="http://192.168.1.101:8081",
+                        help="URL API сервера")
+    parser.add_argument("--duration", type=float, default=10, help="Длительность теста, сек")
+    parser.add_argument("--frequency", type=float, default=20, help="Частота отправки, Гц")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Отправлять запросы конвейером через aiohttp, не дожидаясь ответов")
+    parser.add_argument("--max-in-flight", type=int, default=8,
+                        help="Максимум одновременных запросов в режиме --async")
+    parser.add_argument("--output", choices=("text", "json"), default="text",
+                        help="Формат итогов: text или json (json пишется в stdout, прогресс - в stderr)")
+    args = parser.parse_args()
+    
+    if args.use_async:
+        test_stability_async(args.api_url, args.duration, args.frequency, args.max_in_flight,
+                             args.output)
+    else:
+        test_stability(args.api_url, args.duration, args.frequency, args.output)
\ No newline at end of file
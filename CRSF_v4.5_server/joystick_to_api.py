@@ -17,14 +17,20 @@
     python3 joystick_to_api.py [опции]
 """
 
+import os
+import re
 import sys
 import time
+import select
 import signal
 import argparse
+import glob
 import threading
 import queue
-from typing import List, Set, Dict, Tuple
+import array
+from typing import List, Set, Dict, Tuple, Optional
 from collections import deque
+import numpy as np
 from api_wrapper import CRSFAPIWrapper
 
 # Попытка импортировать pygame
@@ -37,6 +43,18 @@ except ImportError:
     print("  Установите: pip install pygame")
     sys.exit(1)
 
+# numba опциональна: без нее функции преобразования работают как обычный Python
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
 
 # Значения по умолчанию
 DEFAULT_API_URL = "http://localhost:8081"
@@ -70,9 +88,14 @@ AUX_CONFIG = []
 running = True
 crsf = None
 
-# Очередь для отправки каналов
-send_queue = queue.Queue(maxsize=10)
-send_lock = threading.Lock()
+# Почтовый ящик для отправки каналов: хранит только последний снимок,
+# поток отправки всегда берет самые свежие значения
+_mailbox_lock = threading.Lock()
+_mailbox = [None]
+_mailbox_evt = threading.Event()
+
+# Очередь статусных строк: форматирование и вывод идут вне цикла управления
+status_queue = queue.SimpleQueue()
 
 
 def signal_handler(sig, frame):
@@ -82,72 +105,81 @@ def signal_handler(sig, frame):
     running = False
 
 
-def parse_aux_config(config_str: str) -> Tuple[str, int, int, bool, int, int, str]:
+# Формат AUX конфигурации: тип:номер:канал[:invert|min[:max]]
+_AUX_RE = re.compile(
+    r'^(?P<kind>axis|button|hat):(?P<num>\d+):(?P<ch>\d+)'
+    r'(?::(?P<tail1>[^:]+))?(?::(?P<tail2>\d+))?$',
+    re.IGNORECASE
+)
+
+
+def _parse_axis_tail(m) -> Tuple[bool, int, int, str]:
+    tail1 = m['tail1']
+    return (tail1 is not None and tail1.lower() == 'invert', 1000, 2000, 'range')
+
+
+def _parse_button_tail(m) -> Tuple[bool, int, int, str]:
+    tail1, tail2 = m['tail1'], m['tail2']
+    if tail2 is not None:
+        return (False, int(tail1), int(tail2), 'range')
+    return (tail1 is not None and tail1.lower() == 'invert', 1000, 2000, 'switch')
+
+
+def _parse_hat_tail(m) -> Tuple[bool, int, int, str]:
+    return (False, 1000, 2000, 'hat')
+
+
+_AUX_TAIL_PARSERS = {
+    'axis': _parse_axis_tail,
+    'button': _parse_button_tail,
+    'hat': _parse_hat_tail,
+}
+
+
+def parse_aux_config(config_str: str) -> Tuple[str, int, int, bool, int, int, str, Optional[float]]:
     """
     Парсит строку конфигурации AUX канала
-    """
-    parts = config_str.split(':')
     
-    if len(parts) < 3:
+    Последний элемент - коэффициент масштабирования в диапазон [min_val..max_val]
+    (None для полного диапазона 1000-2000, масштабирование не нужно)
+    """
+    m = _AUX_RE.match(config_str)
+    if m is None:
         raise ValueError(f"Неверный формат конфигурации: {config_str}")
     
-    src_type = parts[0].lower()
-    src_num = int(parts[1])
-    channel = int(parts[2])
-    
-    invert = False
-    min_val = 1000
-    max_val = 2000
-    toggle_type = 'switch'
-    
-    if src_type == 'axis':
-        if len(parts) >= 4:
-            invert = parts[3].lower() == 'invert'
-        min_val = 1000
-        max_val = 2000
-        toggle_type = 'range'
-    
-    elif src_type == 'button':
-        if len(parts) >= 5:
-            min_val = int(parts[3])
-            max_val = int(parts[4])
-            toggle_type = 'range'
-        elif len(parts) >= 4:
-            invert = parts[3].lower() == 'invert'
-            min_val = 1000
-            max_val = 2000
-            toggle_type = 'switch'
-    
-    elif src_type == 'hat':
-        if len(parts) >= 4:
-            direction = parts[3].lower()
-        min_val = 1000
-        max_val = 2000
-        toggle_type = 'hat'
-    
-    return (src_type, src_num, channel, invert, min_val, max_val, toggle_type)
+    src_type = m['kind'].lower()
+    invert, min_val, max_val, toggle_type = _AUX_TAIL_PARSERS[src_type](m)
+    
+    scale = None
+    if min_val != 1000 or max_val != 2000:
+        scale = (max_val - min_val) / 1000.0
+    
+    return (src_type, int(m['num']), int(m['ch']), invert, min_val, max_val, toggle_type, scale)
 
 
+@njit(cache=True, fastmath=True)
 def axis_to_crsf(value: float, deadzone: float = 0.0, invert: bool = False) -> int:
     """
     Преобразует значение оси джойстика [-1.0..1.0] в значение CRSF канала [1000..2000]
     """
-    if invert:
-        value = -value
-    
-    if abs(value) < deadzone:
-        value = 0.0
-    
-    crsf_value = int(1500 + value * 500)
-    
-    if crsf_value < 1000:
-        crsf_value = 1000
-    elif crsf_value > 2000:
-        crsf_value = 2000
-    
-    return crsf_value
+    sign = -1.0 if invert else 1.0
+    v = sign * value
+    # Мертвая зона и ограничение без ветвлений (под numba - minsd/maxsd)
+    v *= abs(v) >= deadzone
+    return min(2000, max(1000, int(1500.0 + v * 500.0)))
+
+
+def axes_to_crsf(values: np.ndarray, invert_mask: np.ndarray, deadzone: float = 0.0) -> np.ndarray:
+    """
+    Векторный вариант axis_to_crsf: преобразует массив осей за один вызов
+    """
+    v = np.where(invert_mask, -values, values)
+    v[np.abs(v) < deadzone] = 0.0
+    # 1500 + v*500 всегда >= 1000, поэтому astype отбрасывает дробную часть как int()
+    return np.clip(1500.0 + v * 500.0, 1000, 2000).astype(np.int16)
 
 
+@njit(cache=True)
 def button_to_crsf(button_state: bool, min_val: int = 1000, max_val: int = 2000, invert: bool = False) -> int:
     """
     Преобразует состояние кнопки в значение CRSF канала
@@ -204,6 +236,45 @@ def init_joystick(joystick_id: int = 0):
     return joystick
 
 
+def find_joystick_device(joystick, joystick_id: int = 0) -> str:
+    """
+    Ищет /dev/input/jsN того же устройства, что открыл pygame.
+    Индекс pygame не обязан совпадать с N (SDL2 перечисляет устройства через evdev),
+    поэтому устройство ищется по имени из sysfs. Если однозначного совпадения нет,
+    используется /dev/input/js{joystick_id}
+    """
+    name = joystick.get_name()
+    matches = []
+    for path in sorted(glob.glob("/dev/input/js*")):
+        try:
+            with open(f"/sys/class/input/{os.path.basename(path)}/device/name") as f:
+                if f.read().strip() == name:
+                    matches.append(path)
+        except OSError:
+            continue
+    
+    if len(matches) == 1:
+        return matches[0]
+    
+    fallback = f"/dev/input/js{joystick_id}"
+    print(f"⚠ Устройство джойстика '{name}' не определено однозначно "
+          f"(совпадений: {len(matches)}), используется {fallback}")
+    return fallback
+
+
+def open_joystick_fd(joystick, joystick_id: int = 0):
+    """
+    Открывает /dev/input/jsN без блокировки, чтобы ждать событий джойстика через select.
+    Возвращает None, если устройство недоступно (например, на Windows)
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        return os.open(find_joystick_device(joystick, joystick_id), os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return None
+
+
 def print_axis_mapping():
     """Выводит информацию о маппинге осей на каналы"""
     print("\nМаппинг осей джойстика на каналы CRSF:")
@@ -226,7 +297,7 @@ def print_axis_mapping():
     if AUX_CONFIG:
         print("\nМаппинг AUX каналов:")
         for config in AUX_CONFIG:
-            src_type, src_num, channel, invert, min_val, max_val, toggle_type = config
+            src_type, src_num, channel, invert, min_val, max_val, toggle_type, scale = config
             ch_name = channel_names.get(channel, f"AUX{channel-4}")
             
             invert_str = " (инвертировано)" if invert else ""
@@ -243,29 +314,57 @@ def send_worker():
     
     while running:
         try:
-            # Берем каналы из очереди с таймаутом
-            channels = send_queue.get(timeout=0.01)
+            # Ждем новый снимок с таймаутом, чтобы заметить остановку
+            if not _mailbox_evt.wait(timeout=0.01):
+                continue
+            _mailbox_evt.clear()
+            with _mailbox_lock:
+                snapshot = _mailbox[0]
+                _mailbox[0] = None
             
             # Отправляем каналы
-            if channels and crsf:
+            if snapshot and crsf:
+                channels = array.array('h')
+                channels.frombytes(snapshot)
                 try:
-                    # ВАЖНО: Всегда отправляем ВСЕ каналы, а не только измененные
+                    # ВАЖНО: Всегда отправляем ВСЕ каналы, а не только измененные.
+                    # sendChannels не нужен: каналы уходят в CRSF сразу после setChannels
                     crsf.set_channels(channels)
-                    crsf.send_channels()
-                    send_queue.task_done()
                     
                 except Exception as e:
                     print(f"⚠ Ошибка отправки каналов: {e}")
-                    send_queue.task_done()
                     
-        except queue.Empty:
-            # Очередь пуста, продолжаем
-            continue
         except Exception as e:
             print(f"⚠ Ошибка в send_worker: {e}")
             time.sleep(0.01)
 
 
+def print_worker():
+    """Рабочий поток для вывода статуса"""
+    # Номера AUX каналов для вывода не меняются после запуска
+    aux_print_channels = [config[2] for config in AUX_CONFIG if config[2] <= 8]
+    
+    while running:
+        try:
+            timestamp, snapshot, actual_rate = status_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        
+        channels = array.array('h')
+        channels.frombytes(snapshot)
+        
+        line = (f"[{time.strftime('%H:%M:%S', time.localtime(timestamp))}] "
+                f"CH1={channels[0]:4d} CH2={channels[1]:4d} "
+                f"CH3={channels[2]:4d} CH4={channels[3]:4d} "
+                f"Rate: {actual_rate:.1f} Hz")
+        
+        # Выводим AUX каналы
+        aux_channels = [f"CH{channel}={channels[channel-1]:4d}" for channel in aux_print_channels]
+        if aux_channels:
+            line += f" AUX: {' '.join(aux_channels)}"
+        print(line)
+
+
 def main():
     """Основная функция"""
     global running, crsf, AUX_CONFIG
@@ -339,6 +438,12 @@ def main():
         help='Отключить многопоточность (отправка в основном потоке)'
     )
     
+    parser.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Не выводить статус каналов каждую секунду'
+    )
+    
     args = parser.parse_args()
     
     # Проверяем параметры
@@ -391,7 +496,8 @@ def main():
     # Инициализируем pygame
     print("Инициализация pygame...")
     pygame.init()
-    # Устанавливаем минимальный набор событий
+    # Устанавливаем минимальный набор событий. События джойстика блокировать
+    # нельзя: без них SDL перестает обновлять состояние осей/кнопок в pump()
     pygame.event.set_allowed([
         pygame.JOYAXISMOTION,
         pygame.JOYBUTTONDOWN,
@@ -409,16 +515,21 @@ def main():
         sys.exit(1)
     print()
     
+    # Число осей/кнопок/хэтов не меняется за сессию - читаем один раз
+    numaxes = joystick.get_numaxes()
+    numbuttons = joystick.get_numbuttons()
+    numhats = joystick.get_numhats()
+    
     # Проверяем доступность источников для AUX каналов
     for config in AUX_CONFIG:
-        src_type, src_num, channel, invert, min_val, max_val, toggle_type = config
+        src_type, src_num, channel, invert, min_val, max_val, toggle_type, scale = config
         
-        if src_type == 'axis' and src_num >= joystick.get_numaxes():
-            print(f"⚠ Внимание: Ось {src_num} не доступна на джойстике (доступно осей: {joystick.get_numaxes()})")
-        elif src_type == 'button' and src_num >= joystick.get_numbuttons():
-            print(f"⚠ Внимание: Кнопка {src_num} не доступна на джойстике (доступно кнопок: {joystick.get_numbuttons()})")
-        elif src_type == 'hat' and src_num >= joystick.get_numhats():
-            print(f"⚠ Внимание: Хэт {src_num} не доступна на джойстике (доступно хэтов: {joystick.get_numhats()})")
+        if src_type == 'axis' and src_num >= numaxes:
+            print(f"⚠ Внимание: Ось {src_num} не доступна на джойстике (доступно осей: {numaxes})")
+        elif src_type == 'button' and src_num >= numbuttons:
+            print(f"⚠ Внимание: Кнопка {src_num} не доступна на джойстике (доступно кнопок: {numbuttons})")
+        elif src_type == 'hat' and src_num >= numhats:
+            print(f"⚠ Внимание: Хэт {src_num} не доступна на джойстике (доступно хэтов: {numhats})")
     
     # Выводим информацию о маппинге
     print_axis_mapping()
@@ -459,6 +570,10 @@ def main():
         print("✓ Многопоточный режим включен")
     else:
         print("⚠ Многопоточный режим отключен (отправка в основном потоке)")
+    
+    # Запускаем поток вывода статуса
+    if not args.quiet:
+        threading.Thread(target=print_worker, daemon=True).start()
     print()
     
     # Вычисляем интервал обновления
@@ -473,13 +588,36 @@ def main():
     print("=" * 60)
     print()
     
-    # Инициализируем каналы нейтральными значениями
-    channels = [1500] * 16
+    # Инициализируем каналы нейтральными значениями (16 x int16, 32 байта подряд)
+    channels = array.array('h', [1500] * 16)
+    
+    # Прогреваем JIT заранее, чтобы компиляция не попала в цикл управления
+    if NUMBA_AVAILABLE:
+        axis_to_crsf(0.0, args.deadzone, False)
+        button_to_crsf(False, 1000, 2000, False)
+    
+    # Основные оси обрабатываются одним векторным вызовом за такт
+    main_axes = [(axis_id, channel_id) for axis_id, channel_id in AXIS_TO_CHANNEL.items()
+                 if axis_id < numaxes]
+    main_axis_ids = [axis_id for axis_id, _ in main_axes]
+    main_channel_idx = [channel_id - 1 for _, channel_id in main_axes]
+    main_axis_values = np.zeros(len(main_axes), dtype=np.float32)
+    main_invert = np.array([axis_id in inverted_axes for axis_id in main_axis_ids], dtype=bool)
+    deadzone = np.float32(args.deadzone)
+    
+    # Дескриптор джойстика для ожидания событий вместо частых пробуждений
+    joystick_fd = open_joystick_fd(joystick, args.joystick_id)
+    
+    # Локальные ссылки на методы джойстика для горячего цикла
+    get_axis = joystick.get_axis
+    get_button = joystick.get_button
+    get_hat = joystick.get_hat
     
     # Основной цикл
     last_update_time = time.monotonic()
     iteration = 0
-    last_axis_values = {}
+    # Последние значения осей AUX (NaN - значение еще не читалось)
+    last_aux_axis = np.full(numaxes, np.nan, dtype=np.float32)
     
     # Счетчик для отладки
     send_counter = 0
@@ -487,64 +625,54 @@ def main():
     
     try:
         while running:
-            # ВАЖНО: Всегда обрабатываем события
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
+            # ВАЖНО: pump обновляет состояние джойстика без создания списка событий
+            pygame.event.pump()
             
             # Сбрасываем флаг обновления
             channels_changed = False
             
             # Читаем ВСЕ оси и обновляем каналы
-            for axis_id, channel_id in AXIS_TO_CHANNEL.items():
-                if axis_id < joystick.get_numaxes():
-                    axis_value = joystick.get_axis(axis_id)
-                    
-                    # Проверяем изменение
-                    key = f"axis_{axis_id}"
-                    if key not in last_axis_values or abs(last_axis_values[key] - axis_value) > 0.0001:
-                        last_axis_values[key] = axis_value
-                        
-                        invert = axis_id in inverted_axes
-                        crsf_value = axis_to_crsf(axis_value, args.deadzone, invert)
-                        
-                        if channels[channel_id - 1] != crsf_value:
-                            channels[channel_id - 1] = crsf_value
-                            channels_changed = True
+            for i, axis_id in enumerate(main_axis_ids):
+                main_axis_values[i] = get_axis(axis_id)
+            
+            crsf_values = axes_to_crsf(main_axis_values, main_invert, deadzone).tolist()
+            for channel_idx, crsf_value in zip(main_channel_idx, crsf_values):
+                if channels[channel_idx] != crsf_value:
+                    channels[channel_idx] = crsf_value
+                    channels_changed = True
             
             # Читаем AUX каналы
             for config in AUX_CONFIG:
-                src_type, src_num, channel, invert, min_val, max_val, toggle_type = config
+                src_type, src_num, channel, invert, min_val, max_val, toggle_type, scale = config
                 
                 try:
-                    if src_type == 'axis' and src_num < joystick.get_numaxes():
-                        axis_value = joystick.get_axis(src_num)
+                    if src_type == 'axis' and src_num < numaxes:
+                        axis_value = get_axis(src_num)
                         
-                        # Проверяем изменение
-                        key = f"aux_axis_{src_num}"
-                        if key not in last_axis_values or abs(last_axis_values[key] - axis_value) > 0.0001:
-                            last_axis_values[key] = axis_value
+                        # Проверяем изменение (сравнение с NaN ложно, поэтому первое чтение проходит)
+                        if not abs(last_aux_axis[src_num] - axis_value) <= 0.0001:
+                            last_aux_axis[src_num] = axis_value
                             
                             new_value = axis_to_crsf(axis_value, args.deadzone, invert)
                             
                             # Масштабируем для пользовательского диапазона
-                            if min_val != 1000 or max_val != 2000:
-                                new_value = int(min_val + (max_val - min_val) * (new_value - 1000) / 1000)
+                            if scale is not None:
+                                new_value = int(min_val + scale * (new_value - 1000))
                             
                             if channels[channel - 1] != new_value:
                                 channels[channel - 1] = new_value
                                 channels_changed = True
                     
-                    elif src_type == 'button' and src_num < joystick.get_numbuttons():
-                        button_state = joystick.get_button(src_num) == 1
+                    elif src_type == 'button' and src_num < numbuttons:
+                        button_state = get_button(src_num) == 1
                         new_value = button_to_crsf(button_state, min_val, max_val, invert)
                         
                         if channels[channel - 1] != new_value:
                             channels[channel - 1] = new_value
                             channels_changed = True
                     
-                    elif src_type == 'hat' and src_num < joystick.get_numhats():
-                        hat_value = joystick.get_hat(src_num)
+                    elif src_type == 'hat' and src_num < numhats:
+                        hat_value = get_hat(src_num)
                         new_value = hat_to_crsf(hat_value, 'x')
                         
                         if channels[channel - 1] != new_value:
@@ -568,29 +696,15 @@ def main():
                     # Отправка в основном потоке
                     try:
                         crsf.set_channels(channels)
-                        crsf.send_channels()
                         send_counter += 1
                     except Exception as e:
                         print(f"⚠ Ошибка отправки: {e}")
                 else:
-                    # Отправка через поток
-                    try:
-                        # Очищаем очередь от старых сообщений
-                        while not send_queue.empty():
-                            try:
-                                send_queue.get_nowait()
-                                send_queue.task_done()
-                            except queue.Empty:
-                                break
-                        
-                        # Добавляем новые каналы
-                        send_queue.put_nowait(channels.copy())
-                        send_counter += 1
-                    except queue.Full:
-                        # Очередь полна, пропускаем кадр
-                        print("⚠ Очередь отправки переполнена, пропускаем кадр")
-                    except Exception as e:
-                        print(f"⚠ Ошибка добавления в очередь: {e}")
+                    # Отправка через поток: перезаписываем неотправленный снимок
+                    with _mailbox_lock:
+                        _mailbox[0] = bytes(channels)
+                    _mailbox_evt.set()
+                    send_counter += 1
                 
                 # Обновляем время последней отправки
                 last_update_time = current_time
@@ -598,33 +712,34 @@ def main():
             
             # Периодически выводим статус
             if current_time - last_print_time >= 1.0:
-                elapsed = current_time - last_print_time
-                actual_rate = send_counter / elapsed if elapsed > 0 else 0
-                
-                print(f"[{time.strftime('%H:%M:%S')}] "
-                      f"CH1={channels[0]:4d} CH2={channels[1]:4d} "
-                      f"CH3={channels[2]:4d} CH4={channels[3]:4d} "
-                      f"Rate: {actual_rate:.1f} Hz", end='')
-                
-                # Выводим AUX каналы
-                aux_channels = []
-                for config in AUX_CONFIG:
-                    src_type, src_num, channel, invert, min_val, max_val, toggle_type = config
-                    if channel <= 8:
-                        aux_channels.append(f"CH{channel}={channels[channel-1]:4d}")
-                
-                if aux_channels:
-                    print(f" AUX: {' '.join(aux_channels)}")
-                else:
-                    print()
+                if not args.quiet:
+                    elapsed = current_time - last_print_time
+                    actual_rate = send_counter / elapsed if elapsed > 0 else 0
+                    # Форматирует и печатает print_worker
+                    status_queue.put((time.time(), bytes(channels), actual_rate))
                 
                 # Сбрасываем счетчики
                 send_counter = 0
                 last_print_time = current_time
+                
+                # События не читаются (состояние берется опросом) - очищаем очередь,
+                # чтобы она не росла
+                pygame.event.clear()
+            
+            if joystick_fd is not None:
+                # Спим до следующей отправки или до события джойстика
+                timeout = max(0.0, last_update_time + update_interval - time.monotonic())
+                readable, _, _ = select.select([joystick_fd], [], [], timeout)
+                if readable:
+                    # Сами события читает pygame, здесь только вычитываем буфер
+                    try:
+                        os.read(joystick_fd, 4096)
+                    except BlockingIOError:
+                        pass
             
             # ВАЖНО: Не используем time.sleep() для лучшего отклика
             # Вместо этого используем небольшую задержку только если нужно
-            if time_since_last_update < update_interval / 2:
+            elif time_since_last_update < update_interval / 2:
                 # Если до следующей отправки еще далеко, спим немного
                 time_to_sleep = min(update_interval / 4, 0.001)
                 time.sleep(time_to_sleep)
@@ -636,22 +751,23 @@ def main():
         # Корректное завершение
         print("\nЗавершение работы...")
         
-        # Ждем завершения очереди отправки
-        if not args.no_thread:
-            time.sleep(0.1)
-            send_queue.join()
+        # Ждем завершения потока отправки
+        running = False
+        if send_thread is not None:
+            send_thread.join(timeout=1.0)
         
         # Устанавливаем все каналы в нейтральное положение
         print("Установка каналов в нейтральное положение...")
         try:
             neutral_channels = [1500] * 16
             crsf.set_channels(neutral_channels)
-            crsf.send_channels()
             print("✓ Каналы установлены в нейтральное положение")
         except Exception as e:
             print(f"⚠ Ошибка при установке нейтральных значений: {e}")
         
         # Закрываем джойстик
+        if joystick_fd is not None:
+            os.close(joystick_fd)
         if joystick:
             joystick.quit()
         
@@ -157,6 +157,27 @@ bool parseSetChannels(const std::string& body, std::string& channelsStr) {
     return chNum > 1;
 }
 
+// Парсинг бинарного тела для setChannels.bin
+bool parseSetChannelsBinary(const std::string& body, std::string& channelsStr) {
+    // Формат: 16 значений uint16 little-endian (ровно 32 байта)
+    if (body.size() != 32) {
+        std::cout << "❌ setChannels.bin: ожидается 32 байта, получено " << body.size() << std::endl;
+        return false;
+    }
+    
+    channelsStr = "setChannels";
+    for (size_t i = 0; i < 16; ++i) {
+        int value = static_cast<unsigned char>(body[2 * i]) |
+                    (static_cast<unsigned char>(body[2 * i + 1]) << 8);
+        if (value < 1000 || value > 2000) {
+            std::cout << "❌ Значение " << value << " вне диапазона 1000-2000" << std::endl;
+            return false;
+        }
+        channelsStr += " " + std::to_string(i + 1) + "=" + std::to_string(value);
+    }
+    return true;
+}
+
 // Парсинг JSON для setMode
 bool parseSetMode(const std::string& body, std::string& mode) {
     // Формат: {"mode":"joystick"} или {"mode":"manual"}
@@ -215,6 +236,7 @@ void handleHttpRequest(int clientSocket, const std::string& request) {
 <ul>
 <li>POST /api/command/setChannel - установка одного канала</li>
 <li>POST /api/command/setChannels - установка всех каналов</li>
+<li>POST /api/command/setChannels.bin - установка всех каналов (16 x uint16 LE)</li>
 <li>POST /api/command/sendChannels - отправка каналов</li>
 <li>POST /api/command/setMode - установка режима</li>
 <li>POST /api/telemetry - приём телеметрии от интерпретатора</li>
@@ -261,6 +283,15 @@ void handleHttpRequest(int clientSocket, const std::string& request) {
             } else {
                 responseJson = "{\"status\":\"error\",\"message\":\"Invalid channels array\"}";
             }
+        } else if (command == "setChannels.bin") {
+            std::string channelsStr;
+            if (parseSetChannelsBinary(body, channelsStr)) {
+                std::stringstream cmdBody;
+                cmdBody << "{\"command\":\"setChannels\",\"channelsStr\":\"" << channelsStr << "\"}";
+                success = sendCommandToTarget("setChannels", cmdBody.str());
+            } else {
+                responseJson = "{\"status\":\"error\",\"message\":\"Invalid binary channels\"}";
+            }
         } else if (command == "sendChannels") {
             success = sendCommandToTarget("sendChannels", "{\"command\":\"sendChannels\"}");
         } else if (command == "setMode") {
@@ -297,7 +328,8 @@ void handleClient(int clientSocket) {
     
     if (bytesReceived > 0) {
         buffer[bytesReceived] = '\0';
-        std::string request(buffer);
+        // Длина задается явно: тело setChannels.bin может содержать нулевые байты
+        std::string request(buffer, bytesReceived);
         handleHttpRequest(clientSocket, request);
     }
     
@@ -5,7 +5,7 @@ API Wrapper для CRSF
 """
 
 import requests
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 import json
 
 
@@ -119,27 +119,42 @@ class CRSFAPIWrapper:
                 'workMode': 'manual'
             }
     
-    def set_work_mode(self, mode: str):
+    def _post(self, path: str, data: Dict, error_prefix: str) -> Dict:
         """
-        Установить режим работы
+        Отправить команду на API сервер и проверить статус ответа
         
         Args:
-            mode: 'joystick' или 'manual'
-        """
-        if mode not in ['joystick', 'manual']:
-            raise ValueError(f"Неверный режим: {mode}. Допустимые значения: 'joystick', 'manual'")
+            path: Путь команды (например, "/api/command/setChannels")
+            data: Тело запроса
+            error_prefix: Текст ошибки, если сервер вернул статус не 'ok'
         
-        url = f"{self.api_server_url}/api/command/setMode"
-        data = {"mode": mode}
+        Returns:
+            Ответ сервера
+        """
+        url = f"{self.api_server_url}{path}"
         
         try:
             response = requests.post(url, json=data, timeout=5)
             response.raise_for_status()
             result = response.json()
-            if result.get('status') != 'ok':
-                raise RuntimeError(f"Ошибка установки режима: {result.get('message', 'Unknown error')}")
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"Ошибка отправки команды: {e}")
+        
+        if result.get('status') != 'ok':
+            raise RuntimeError(f"{error_prefix}: {result.get('message', 'Unknown error')}")
+        return result
+    
+    def set_work_mode(self, mode: str):
+        """
+        Установить режим работы
+        
+        Args:
+            mode: 'joystick' или 'manual'
+        """
+        if mode not in ['joystick', 'manual']:
+            raise ValueError(f"Неверный режим: {mode}. Допустимые значения: 'joystick', 'manual'")
+        
+        self._post("/api/command/setMode", {"mode": mode}, "Ошибка установки режима")
     
     def get_work_mode(self) -> str:
         """
@@ -166,53 +181,26 @@ class CRSFAPIWrapper:
         if not (1000 <= value <= 2000):
             raise ValueError(f"Значение канала должно быть от 1000 до 2000, получено: {value}")
         
-        url = f"{self.api_server_url}/api/command/setChannel"
-        data = {"channel": channel, "value": value}
-        
-        try:
-            response = requests.post(url, json=data, timeout=5)
-            response.raise_for_status()
-            result = response.json()
-            if result.get('status') != 'ok':
-                raise RuntimeError(f"Ошибка установки канала: {result.get('message', 'Unknown error')}")
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Ошибка отправки команды: {e}")
+        self._post("/api/command/setChannel", {"channel": channel, "value": value},
+                   "Ошибка установки канала")
     
-    def set_channels(self, channels: List[int]):
+    def set_channels(self, channels: Sequence[int]):
         """
         Установить все каналы одновременно
         
         Args:
-            channels: Список значений каналов (16 элементов, 1000-2000)
+            channels: Значения каналов (16 элементов, 1000-2000): список
+                      или array.array('h')
         """
         if len(channels) < 16:
             raise ValueError(f"Должно быть 16 каналов, получено: {len(channels)}")
         
-        url = f"{self.api_server_url}/api/command/setChannels"
-        data = {"channels": channels[:16]}
-        
-        try:
-            response = requests.post(url, json=data, timeout=5)
-            response.raise_for_status()
-            result = response.json()
-            if result.get('status') != 'ok':
-                raise RuntimeError(f"Ошибка установки каналов: {result.get('message', 'Unknown error')}")
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Ошибка отправки команды: {e}")
+        self._post("/api/command/setChannels", {"channels": list(channels[:16])},
+                   "Ошибка установки каналов")
     
     def send_channels(self):
         """Отправить пакет каналов"""
-        url = f"{self.api_server_url}/api/command/sendChannels"
-        data = {}
-        
-        try:
-            response = requests.post(url, json=data, timeout=5)
-            response.raise_for_status()
-            result = response.json()
-            if result.get('status') != 'ok':
-                raise RuntimeError(f"Ошибка отправки каналов: {result.get('message', 'Unknown error')}")
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Ошибка отправки команды: {e}")
+        self._post("/api/command/sendChannels", {}, "Ошибка отправки каналов")
     
     @property
     def is_initialized(self) -> bool:
@@ -9,11 +9,55 @@ import tkinter as tk
 from tkinter import ttk
 import threading
 import time
-from datetime import datetime
+import socket
+import http.client
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import Timeout as RequestTimeout, ConnectionError as RequestConnectionError
 import argparse
 import sys
 
+# orjson заметно быстрее stdlib json; если не установлен - используем json
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
+# Ошибки сокета/протокола на пути TX через http.client
+TX_CONNECTION_ERRORS = (OSError, http.client.HTTPException)
+
+
+class SingleSendHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection, отправляющий заголовки и тело одним sendall
+    
+    http.client по умолчанию отправляет заголовки и тело двумя send(), а
+    сервер читает запрос одним recv() и часто получает его без тела
+    ("Invalid channels array"). TCP_NODELAY здесь не спасает: сервер
+    просыпается уже от первого сегмента
+    """
+    
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def _send_output(self, message_body=None, encode_chunked=False):
+        if not isinstance(message_body, (bytes, bytearray)) or encode_chunked:
+            return super()._send_output(message_body, encode_chunked)
+        # Тот же формат, что в http.client: заголовки, пустая строка, тело
+        self._buffer.extend((b"", b""))
+        msg = b"\r\n".join(self._buffer)
+        del self._buffer[:]
+        self.send(msg + message_body)
+
 
 class CrsfClientApp:
     """Главный класс приложения для управления CRSF через API"""
@@ -34,19 +78,57 @@ class CrsfClientApp:
         self.host = host
         self.port = port
         self.base_url = f"http://{host}:{port}"
-        self.channels_url = f"{self.base_url}/api/command/setChannels"
         self.telemetry_url = f"{self.base_url}/api/telemetry"
         
-        # Используем Session для переиспользования соединений
+        # Используем Session для переиспользования соединений (поток RX),
+        # без повторов запросов
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.session.headers.update({'Content-Type': 'application/json'})
         
+        # Горячий путь TX (20 Гц) идет напрямую через http.client без
+        # накладных расходов requests; соединение принадлежит потоку TX
+        self._channels_path = "/api/command/setChannels"
+        self._tx_headers = {'Content-Type': 'application/json'}
+        # Бинарный endpoint: 16 x uint16 little-endian (32 байта) вместо JSON.
+        # None - еще не проверен, True/False - поддерживается ли сервером
+        self._channels_bin_path = "/api/command/setChannels.bin"
+        self._tx_bin_headers = {'Content-Type': 'application/octet-stream'}
+        self._binary_ok = None
+        self._tx_conn = SingleSendHTTPConnection(host, port, timeout=0.1)
+        
         # Состояние приложения
         self.is_running = False
-        self.channels = [1500] * 16  # 16 каналов, начальное значение 1500
+        # 16 каналов, начальное значение 1500 (int16: компактно, без PyLong на элемент)
+        self.channels = np.full(16, 1500, dtype=np.int16)
         self.telemetry_data = {}
         
-        # Потоки
+        # Шаблон тела POST: {"channels":[XXXX,XXXX,...]} - каждый канал ровно
+        # 4 цифры (1000..2000), поэтому цифры просто перезаписываются на месте
+        self._body_prefix = b'{"channels":['
+        self._body = bytearray(self._body_prefix + b','.join([b'1500'] * 16) + b']}')
+        
+        # Последний успешно отправленный payload: без изменений каналов
+        # шлем только редкий heartbeat вместо 20 POST в секунду
+        self._last_payload = None
+        self._last_heartbeat = 0.0
+        self.heartbeat_interval = 0.5
+        
+        # Последний статус TX/RX, отправленный из рабочих потоков в Tk
+        self._tx_ok = None
+        self._rx_ok = None
+        
+        # Изменения слайдеров копятся здесь и применяются раз за idle-цикл Tk
+        self._pending_channel_updates = {}
+        self._adjusted_channels = set()
+        self._commit_scheduled = False
+        
+        # Потоки и их период (20 Гц каналы, 10 Гц телеметрия)
+        self.send_period = 0.05
+        self.telemetry_period = 0.1
+        self._stop_evt = threading.Event()
         self.send_thread = None
         self.telemetry_thread = None
         
@@ -56,6 +138,11 @@ class CrsfClientApp:
         # Привязываем клавиатуру
         self.setup_keyboard_bindings()
         
+        # Телеметрию не перерисовываем, пока окно свернуто
+        self._telemetry_visible = True
+        self.root.bind('<Map>', self._on_map_change)
+        self.root.bind('<Unmap>', self._on_map_change)
+        
         # Обработка закрытия окна
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
@@ -116,8 +203,9 @@ class CrsfClientApp:
         channels_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         # Создаем слайдеры для каналов
+        # Одна IntVar на канал: ее двигает слайдер и показывает метка значения
         self.channel_scales = []
-        self.channel_labels = []
+        self.channel_vars = []
         
         channel_names = ["Roll", "Pitch", "Throttle", "Yaw", 
                         "Aux1", "Aux2", "Aux3", "Aux4",
@@ -139,11 +227,11 @@ class CrsfClientApp:
                             command=lambda val, idx=i: self.on_channel_change(idx, val))
             scale.grid(row=row, column=col+1, padx=(0, 5))
             self.channel_scales.append(scale)
+            self.channel_vars.append(var)
             
             # Значение
-            value_label = ttk.Label(channels_frame, text="1500", width=6)
+            value_label = ttk.Label(channels_frame, textvariable=var, width=6)
             value_label.grid(row=row, column=col+2, sticky=tk.W)
-            self.channel_labels.append(value_label)
     
     def create_telemetry_panel(self, parent):
         """Панель отображения телеметрии"""
@@ -151,19 +239,36 @@ class CrsfClientApp:
         telemetry_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         parent.rowconfigure(3, weight=1)
         
-        # Создаем текстовую область для телеметрии
-        self.telemetry_text = tk.Text(telemetry_frame, height=10, width=60, wrap=tk.WORD)
-        scrollbar = ttk.Scrollbar(telemetry_frame, orient="vertical", command=self.telemetry_text.yview)
-        self.telemetry_text.configure(yscrollcommand=scrollbar.set)
-        
-        self.telemetry_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        telemetry_frame.columnconfigure(0, weight=1)
-        telemetry_frame.rowconfigure(0, weight=1)
-        
-        # Начальное сообщение
-        self.telemetry_text.insert("1.0", "Ожидание телеметрии...\n")
-        self.telemetry_text.config(state=tk.DISABLED)
+        # Фиксированная сетка меток: на каждом тике меняются только StringVar,
+        # Tk перерисовывает лишь изменившиеся метки
+        fields = [
+            ("updated", "Обновлено:"),
+            ("link_up", "Link Up:"),
+            ("link_q", "Link Quality:"),
+            ("port", "Active Port:"),
+            ("gps", "GPS:"),
+            ("gps_alt", ""),
+            ("battery", "Батарея:"),
+            ("attitude", "Attitude:"),
+        ]
+        self._tel_vars = {}
+        for row, (key, title) in enumerate(fields):
+            ttk.Label(telemetry_frame, text=title).grid(row=row, column=0, sticky=tk.W, padx=(0, 10))
+            var = tk.StringVar(value="-")
+            ttk.Label(telemetry_frame, textvariable=var).grid(row=row, column=1, sticky=tk.W)
+            self._tel_vars[key] = var
+        self._tel_vars["updated"].set("Ожидание телеметрии...")
+        
+        # Каналы из телеметрии: 16 меток создаются один раз
+        channels_frame = ttk.Frame(telemetry_frame)
+        channels_frame.grid(row=0, column=2, rowspan=len(fields), sticky=(tk.N, tk.W), padx=(20, 0))
+        self._tel_channel_vars = []
+        for i in range(16):
+            var = tk.StringVar(value=f"CH{i+1}: -")
+            ttk.Label(channels_frame, textvariable=var, width=12).grid(
+                row=i % 8, column=i // 8, sticky=tk.W, padx=(0, 10))
+            self._tel_channel_vars.append(var)
+        telemetry_frame.columnconfigure(1, weight=1)
     
     def create_control_panel(self, parent):
         """Панель управления"""
@@ -217,19 +322,44 @@ class CrsfClientApp:
         if not self.is_running:
             return
         
-        current_value = self.channels[channel_idx]
-        new_value = max(1000, min(2000, current_value + delta))
-        self.channels[channel_idx] = new_value
+        # Ограничиваем диапазон до записи в массив: поток отправки
+        # никогда не видит значение за пределами 1000-2000
+        self.channels[channel_idx] = np.clip(self.channels[channel_idx] + delta, 1000, 2000)
         
-        # Обновляем слайдер
-        self.channel_scales[channel_idx].set(new_value)
-        self.channel_labels[channel_idx].config(text=str(new_value))
+        # Слайдер обновится в idle-цикле: удержание клавиши с автоповтором
+        # дает одно обновление виджетов на кадр
+        self._adjusted_channels.add(channel_idx)
+        if not self._commit_scheduled:
+            self._commit_scheduled = True
+            self.root.after_idle(self._commit_channel_updates)
     
     def on_channel_change(self, channel_idx, value):
         """Обработчик изменения слайдера"""
-        int_value = int(float(value))
-        self.channels[channel_idx] = int_value
-        self.channel_labels[channel_idx].config(text=str(int_value))
+        # Scale вызывает command на каждый пиксель перетаскивания,
+        # поэтому только запоминаем последнее значение
+        self._pending_channel_updates[channel_idx] = int(float(value))
+        if not self._commit_scheduled:
+            self._commit_scheduled = True
+            self.root.after_idle(self._commit_channel_updates)
+    
+    def _commit_channel_updates(self):
+        """Применение накопленных изменений слайдеров и клавиш (одно на idle-цикл)"""
+        pending = self._pending_channel_updates
+        adjusted = self._adjusted_channels
+        self._pending_channel_updates = {}
+        self._adjusted_channels = set()
+        self._commit_scheduled = False
+        
+        # ttk.Scale пишет в переменную дробное значение - округляем его,
+        # метка значения обновится сама через textvariable
+        for channel_idx, int_value in pending.items():
+            self.channels[channel_idx] = int_value
+            self.channel_vars[channel_idx].set(int_value)
+        
+        # Каналы, измененные с клавиатуры: значение уже ограничено,
+        # переносим его на слайдер и метку
+        for channel_idx in adjusted:
+            self.channel_vars[channel_idx].set(int(self.channels[channel_idx]))
     
     def set_tx_status(self, is_ok):
         """Установка статуса TX (зеленый/красный)"""
@@ -245,125 +375,213 @@ class CrsfClientApp:
         else:
             self.rx_status_label.config(text="●", foreground="red")
     
+    def _report_tx_status(self, is_ok):
+        """Передача статуса TX из рабочего потока в главный (только при изменении)"""
+        if self._tx_ok is not is_ok:
+            self._tx_ok = is_ok
+            self.root.after(0, self.set_tx_status, is_ok)
+    
+    def _report_rx_status(self, is_ok):
+        """Передача статуса RX из рабочего потока в главный (только при изменении)"""
+        if self._rx_ok is not is_ok:
+            self._rx_ok = is_ok
+            self.root.after(0, self.set_rx_status, is_ok)
+    
+    def _on_map_change(self, event):
+        """Отслеживание сворачивания/разворачивания главного окна"""
+        if event.widget is self.root:
+            self._telemetry_visible = event.type == tk.EventType.Map
+    
+    def _post_status(self, message, color):
+        """Обновление строки статуса из рабочего потока (через очередь Tk)"""
+        self.root.after(0, self.update_status_bar, message, color)
+    
     def update_status_bar(self, message, color="black"):
         """Обновление строки статуса"""
         self.status_bar.config(text=message, foreground=color)
     
+    def _encode_channels(self):
+        """Сериализация каналов в JSON через заранее подготовленный шаблон"""
+        body = self._body
+        offset = len(self._body_prefix)
+        values = self.channels.tolist()
+        for value in values:
+            if not 1000 <= value <= 9999:
+                # Не 4 цифры - шаблон не подходит, используем обычный JSON
+                return json_dumps({"channels": values})
+            body[offset:offset + 4] = b"%d" % value
+            offset += 5
+        return bytes(body)
+    
     def send_channels_loop(self):
         """Цикл отправки каналов в отдельном потоке"""
         while self.is_running:
-            try:
-                # Отправляем каналы с тайм-аутом 100мс
-                response = self.session.post(
-                    self.channels_url,
-                    json={"channels": self.channels},
-                    timeout=0.1
-                )
-                
-                if response.status_code == 200:
-                    self.set_tx_status(True)
-                    self.root.after(0, lambda: self.update_status_bar("TX: OK", "green"))
-                else:
-                    self.set_tx_status(False)
-                    self.root.after(0, lambda: self.update_status_bar(
-                        f"TX: Error {response.status_code}", "orange"))
-                    
-            except requests.exceptions.Timeout:
-                self.set_tx_status(False)
-                self.root.after(0, lambda: self.update_status_bar("TX: Timeout", "red"))
-            except requests.exceptions.ConnectionError:
-                self.set_tx_status(False)
-                self.root.after(0, lambda: self.update_status_bar("TX: Disconnected", "red"))
-            except Exception as e:
-                # Логируем в консоль, но не блокируем интерфейс
-                print(f"TX Error: {e}")
-                self.set_tx_status(False)
-                self.root.after(0, lambda: self.update_status_bar(f"TX: Error - {str(e)[:30]}", "red"))
+            now = time.monotonic()
+            deadline = now + self.send_period
+            
+            binary = self._binary_ok is not False
+            if binary:
+                payload = self.channels.astype('<u2').tobytes()
+            else:
+                payload = self._encode_channels()
+            if (payload != self._last_payload
+                    or now - self._last_heartbeat >= self.heartbeat_interval):
+                self._post_channels(payload, now, binary)
+            # Каналы не менялись - отправку пропускаем до heartbeat
             
-            time.sleep(0.05)  # 20 раз в секунду
+            # Ждем до дедлайна (20 раз в секунду), stop() будит поток сразу
+            if self._stop_evt.wait(max(0.0, deadline - time.monotonic())):
+                break
+    
+    def _post_channels(self, payload, now, binary=False):
+        """Отправка одного пакета каналов и обновление статуса TX"""
+        conn = self._tx_conn
+        if binary:
+            path, headers = self._channels_bin_path, self._tx_bin_headers
+        else:
+            path, headers = self._channels_path, self._tx_headers
+        try:
+            # Отправляем каналы с тайм-аутом 100мс
+            conn.request("POST", path, body=payload, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            
+            if binary and self._binary_ok is None:
+                # Первая бинарная отправка - проверка поддержки сервером.
+                # Старый сервер отвечает 404 или "Unknown command"
+                self._binary_ok = response.status != 404 and b"Unknown command" not in body
+                if not self._binary_ok:
+                    print("Сервер не поддерживает setChannels.bin, используется JSON")
+                    return
+            
+            if response.status == 200:
+                # Сервер отвечает 200 и на отклоненную команду: пакет считается
+                # отправленным только при status == "ok", иначе повтор на следующем такте
+                try:
+                    result = json_loads(body)
+                except ValueError:
+                    result = {}
+                if result.get('status') == 'ok':
+                    self._last_payload = payload
+                    self._last_heartbeat = now
+                    self._report_tx_status(True)
+                    self._post_status("TX: OK", "green")
+                else:
+                    self._report_tx_status(False)
+                    message = result.get('message', 'Invalid response')
+                    self._post_status(f"TX: Error - {message[:30]}", "orange")
+            else:
+                self._report_tx_status(False)
+                self._post_status(f"TX: Error {response.status}", "orange")
+                
+        except socket.timeout:
+            # После ошибки закрываем сокет, следующий request() переподключится
+            conn.close()
+            self._report_tx_status(False)
+            self._post_status("TX: Timeout", "red")
+        except TX_CONNECTION_ERRORS:
+            conn.close()
+            self._report_tx_status(False)
+            self._post_status("TX: Disconnected", "red")
+        except Exception as e:
+            # Логируем в консоль, но не блокируем интерфейс
+            print(f"TX Error: {e}")
+            conn.close()
+            self._report_tx_status(False)
+            self._post_status(f"TX: Error - {str(e)[:30]}", "red")
     
     def get_telemetry_loop(self):
         """Цикл получения телеметрии в отдельном потоке"""
         while self.is_running:
+            deadline = time.monotonic() + self.telemetry_period
             try:
                 # Получаем телеметрию с тайм-аутом 100мс
                 response = self.session.get(self.telemetry_url, timeout=0.1)
+                content = response.content
                 
-                if response.status_code == 200:
-                    data = response.json()
+                if response.status_code == 200 and content:
+                    data = json_loads(content)
                     self.telemetry_data = data
                     
                     # Проверяем link_quality для RX статуса
                     link_quality = data.get('link_quality', 0)
-                    has_data = link_quality > 0 or data.get('linkUp', False)
-                    self.set_rx_status(has_data)
+                    has_data = bool(link_quality > 0 or data.get('linkUp', False))
+                    self._report_rx_status(has_data)
                     
-                    # Обновляем отображение телеметрии
-                    self.root.after(0, lambda d=data: self.update_telemetry_display(d))
-                    self.root.after(0, lambda: self.update_status_bar("RX: OK", "green"))
+                    # Обновляем отображение телеметрии, только если окно видно
+                    if self._telemetry_visible:
+                        self.root.after(0, self.update_telemetry_display, data)
+                    self._post_status("RX: OK", "green")
+                elif response.status_code == 200:
+                    # Пустой ответ - разбирать нечего
+                    self._report_rx_status(False)
+                    self._post_status("RX: Empty response", "orange")
                 else:
-                    self.set_rx_status(False)
-                    self.root.after(0, lambda: self.update_status_bar(
-                        f"RX: Error {response.status_code}", "orange"))
+                    self._report_rx_status(False)
+                    self._post_status(f"RX: Error {response.status_code}", "orange")
                     
-            except requests.exceptions.Timeout:
-                self.set_rx_status(False)
-                self.root.after(0, lambda: self.update_status_bar("RX: Timeout", "red"))
-            except requests.exceptions.ConnectionError:
-                self.set_rx_status(False)
-                self.root.after(0, lambda: self.update_status_bar("RX: Disconnected", "red"))
+            except RequestTimeout:
+                self._report_rx_status(False)
+                self._post_status("RX: Timeout", "red")
+            except RequestConnectionError:
+                self._report_rx_status(False)
+                self._post_status("RX: Disconnected", "red")
             except Exception as e:
                 # Логируем в консоль, но не блокируем интерфейс
                 print(f"RX Error: {e}")
-                self.set_rx_status(False)
-                self.root.after(0, lambda: self.update_status_bar(f"RX: Error - {str(e)[:30]}", "red"))
+                self._report_rx_status(False)
+                self._post_status(f"RX: Error - {str(e)[:30]}", "red")
             
-            time.sleep(0.1)  # 10 раз в секунду для телеметрии
+            # 10 раз в секунду для телеметрии
+            if self._stop_evt.wait(max(0.0, deadline - time.monotonic())):
+                break
     
     def update_telemetry_display(self, data):
         """Обновление отображения телеметрии"""
-        self.telemetry_text.config(state=tk.NORMAL)
-        self.telemetry_text.delete("1.0", tk.END)
+        tel_vars = self._tel_vars
+        get = data.get
+        gps = get('gps') or {}
+        battery = get('battery') or {}
+        attitude = get('attitude') or {}
         
-        # Форматируем данные телеметрии
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        text = f"Обновлено: {timestamp}\n\n"
+        tel_vars["updated"].set(time.strftime("%H:%M:%S"))
         
         # Основная информация
-        text += f"Link Up: {data.get('linkUp', False)}\n"
-        text += f"Link Quality: {data.get('link_quality', 0)}\n"
-        text += f"Active Port: {data.get('activePort', 'Unknown')}\n\n"
+        tel_vars["link_up"].set(str(get('linkUp', False)))
+        tel_vars["link_q"].set(str(get('link_quality', 0)))
+        tel_vars["port"].set(str(get('activePort', 'Unknown')))
         
         # Каналы
-        channels = data.get('channels', [])
-        if channels:
-            text += "Каналы:\n"
-            for i, ch in enumerate(channels[:16]):
-                text += f"  CH{i+1}: {ch}\n"
-            text += "\n"
+        channel_vars = self._tel_channel_vars
+        channels = (get('channels') or [])[:16]
+        for i, ch in enumerate(channels):
+            channel_vars[i].set(f"CH{i+1}: {ch}")
+        # Каналов меньше 16 - остальные метки сбрасываем
+        for i in range(len(channels), 16):
+            channel_vars[i].set(f"CH{i+1}: -")
         
         # GPS
-        gps = data.get('gps', {})
         if gps:
-            text += f"GPS: Lat={gps.get('latitude', 0):.6f}, Lon={gps.get('longitude', 0):.6f}\n"
-            text += f"  Alt={gps.get('altitude', 0):.1f}m, Speed={gps.get('speed', 0):.1f}km/h\n\n"
+            g = gps.get
+            tel_vars["gps"].set(f"Lat={g('latitude', 0):.6f}, Lon={g('longitude', 0):.6f}")
+            tel_vars["gps_alt"].set(f"Alt={g('altitude', 0):.1f}m, Speed={g('speed', 0):.1f}km/h")
+        else:
+            tel_vars["gps"].set("-")
+            tel_vars["gps_alt"].set("-")
         
         # Батарея
-        battery = data.get('battery', {})
         if battery:
-            text += f"Батарея: {battery.get('voltage', 0):.1f}V, "
-            text += f"{battery.get('current', 0):.0f}mA, "
-            text += f"{battery.get('remaining', 0)}%\n\n"
+            b = battery.get
+            tel_vars["battery"].set(f"{b('voltage', 0):.1f}V, {b('current', 0):.0f}mA, {b('remaining', 0)}%")
+        else:
+            tel_vars["battery"].set("-")
         
         # Attitude
-        attitude = data.get('attitude', {})
         if attitude:
-            text += f"Attitude: Roll={attitude.get('roll', 0):.1f}°, "
-            text += f"Pitch={attitude.get('pitch', 0):.1f}°, "
-            text += f"Yaw={attitude.get('yaw', 0):.1f}°\n"
-        
-        self.telemetry_text.insert("1.0", text)
-        self.telemetry_text.config(state=tk.DISABLED)
+            a = attitude.get
+            tel_vars["attitude"].set(f"Roll={a('roll', 0):.1f}°, Pitch={a('pitch', 0):.1f}°, Yaw={a('yaw', 0):.1f}°")
+        else:
+            tel_vars["attitude"].set("-")
     
     def toggle_start_stop(self):
         """Переключение режима Start/Stop"""
@@ -375,6 +593,11 @@ class CrsfClientApp:
     def start(self):
         """Запуск отправки каналов и получения телеметрии"""
         self.is_running = True
+        self._stop_evt.clear()
+        self._last_payload = None
+        self._binary_ok = None
+        self._tx_ok = None
+        self._rx_ok = None
         self.start_stop_button.config(text="Стоп")
         
         # Запускаем потоки
@@ -389,49 +612,55 @@ class CrsfClientApp:
     def stop(self):
         """Остановка отправки каналов и получения телеметрии"""
         self.is_running = False
+        self._stop_evt.set()
         self.start_stop_button.config(text="Старт")
         
-        # Ждем завершения потоков (максимум 1 секунда)
+        # Ждем завершения потоков (максимум 1 секунда, обычно - время одного запроса)
         if self.send_thread:
             self.send_thread.join(timeout=1.0)
         if self.telemetry_thread:
             self.telemetry_thread.join(timeout=1.0)
         
-        self.set_tx_status(False)
-        self.set_rx_status(False)
-        self.update_status_bar("Остановлено", "orange")
+        # Через очередь Tk, чтобы не перетереться обновлениями,
+        # которые потоки успели поставить до остановки
+        self.root.after(0, self.set_tx_status, False)
+        self.root.after(0, self.set_rx_status, False)
+        self.root.after(0, self.update_status_bar, "Остановлено", "orange")
+    
+    def _bulk_set(self, indices, value):
+        """Групповая установка каналов с одной перерисовкой виджетов"""
+        indices = list(indices)
+        self.channels[indices] = value
+        for channel_idx in indices:
+            # Отложенные изменения слайдеров/клавиш не должны перетереть значение
+            self._pending_channel_updates.pop(channel_idx, None)
+            self._adjusted_channels.discard(channel_idx)
+            # IntVar.set не вызывает command слайдера - каскада callback'ов нет
+            self.channel_vars[channel_idx].set(value)
+        self.root.update_idletasks()
     
     def disarm(self):
         """Disarm: устанавливает Throttle в 1000 и AUX1 в Disarm"""
         if not self.is_running:
             return
         
-        # Throttle (CH3, индекс 2) в 1000
-        self.channels[2] = 1000
-        self.channel_scales[2].set(1000)
-        self.channel_labels[2].config(text="1000")
-        
-        # AUX1 (CH5, индекс 4) в Disarm (обычно 1000)
-        self.channels[4] = 1000
-        self.channel_scales[4].set(1000)
-        self.channel_labels[4].config(text="1000")
+        # Throttle (CH3, индекс 2) и AUX1 (CH5, индекс 4) в 1000 (Disarm)
+        self._bulk_set((2, 4), 1000)
         
         self.update_status_bar("Disarm выполнено", "red")
     
     def center_all(self):
         """Установить все каналы в центр (1500)"""
-        for i in range(16):
-            self.channels[i] = 1500
-            self.channel_scales[i].set(1500)
-            self.channel_labels[i].config(text="1500")
+        self._bulk_set(range(16), 1500)
         
         self.update_status_bar("Все каналы установлены в центр", "blue")
     
     def on_closing(self):
         """Обработка закрытия окна"""
         self.stop()
-        # Закрываем сессию
+        # Закрываем сессию и соединение TX
         self.session.close()
+        self._tx_conn.close()
         self.root.destroy()
 
 
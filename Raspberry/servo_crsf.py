@@ -1,9 +1,89 @@
 import time
 import os
-from gpiozero import Servo
-from gpiozero.pins.pigpio import PiGPIOFactory
+import re
+import sys
+
+# inotify опционален (pip install inotify_simple): без него файл опрашивается по таймеру
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# Сколько байт с конца файла читать в поисках последней команды
+TAIL_SIZE = 4096
+
+
+def stat_signature(st):
+    """
+    Признак изменения файла: размер ловит дозапись в пределах одного тика mtime,
+    mtime - перезапись того же размера, inode - пересоздание файла
+    """
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class TailReader:
+    """
+    Чтение хвоста файла через постоянно открытый дескриптор (os.pread)
+    
+    Не открывает файл на каждом опросе. Файл переоткрывается, когда его
+    пересоздали (сменился inode). mmap здесь не подходит: файл команд
+    обрезается при перезаписи, и чтение отображения за новым концом
+    файла завершает процесс по SIGBUS.
+    """
+    
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._fd = None
+        self._ino = None
+    
+    def read_lines(self, st, tail_size=TAIL_SIZE):
+        """
+        Последние строки файла; st - результат os.stat(file_path)
+        """
+        if self._fd is None or st.st_ino != self._ino:
+            self.close()
+            self._fd = os.open(self.file_path, os.O_RDONLY)
+            self._ino = os.fstat(self._fd).st_ino
+        
+        size = os.fstat(self._fd).st_size
+        offset = max(0, size - tail_size)
+        lines = os.pread(self._fd, size - offset, offset).decode('utf-8', 'replace').splitlines()
+        
+        # Первая строка хвоста может быть обрезана
+        if offset > 0 and lines:
+            lines = lines[1:]
+        return lines
+    
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# Скомпилированные выражения "N=значение" по номеру канала
+_CH_RE_CACHE = {}
+
+
+def _channel_value_in_lines(lines, channel_num):
+    """
+    Значение канала из последней команды setChannels среди строк (None, если его нет)
+    """
+    pattern = _CH_RE_CACHE.get(channel_num)
+    if pattern is None:
+        pattern = re.compile(rf'(?:^|\s){channel_num}=(\d+)(?=\s|$)')
+        _CH_RE_CACHE[channel_num] = pattern
+    
+    for line in reversed(lines):
+        if line.lstrip().startswith("setChannels"):
+            m = pattern.search(line)
+            return int(m.group(1)) if m else None
+    return None
+
 
 class CRSFReader:
+    # Пары "канал=значение" для полного разбора строки
+    _CHANNEL_RE = re.compile(r'(?:^|\s)(\d+)=(\d+)(?=\s|$)')
+    
     def __init__(self, servo_pin=18, min_pulse=0.0005, max_pulse=0.0025):
         """
         Инициализация CRSF ридера и сервопривода
@@ -11,24 +91,46 @@ class CRSFReader:
         min_pulse: минимальная длительность импульса
         max_pulse: максимальная длительность импульса
         """
-        # Используем pigpio для более плавного управления
-        factory = PiGPIOFactory()
-        self.servo = Servo(servo_pin,
-                          min_pulse_width=min_pulse,
-                          max_pulse_width=max_pulse,
-                          pin_factory=factory)
+        # GPIO библиотеки импортируются только при создании ридера:
+        # мониторинг и тест парсера работают без них
+        import pigpio
+        
+        # Управляем импульсом напрямую через демон pigpiod
+        self._pi = pigpio.pi()
+        if not self._pi.connected:
+            raise RuntimeError("Нет подключения к pigpiod (запустите: sudo pigpiod)")
+        self._pin = servo_pin
+        
+        # Длительность импульса (мкс) для каждой позиции сервопривода
+        min_us = int(round(min_pulse * 1e6))
+        max_us = int(round(max_pulse * 1e6))
+        self._us = {
+            "min": min_us,
+            "mid": (min_us + max_us) // 2,
+            "max": max_us,
+        }
         
         self.file_path = "/tmp/crsf_command.txt"
         self.last_position = None
         
+        # Кэш последнего чтения: файл перечитывается, только если изменился
+        self._last_stat = None
+        self._last_ch5 = None
+        self._tail = TailReader(self.file_path)
+        
         # Три основных позиции сервопривода
         self.positions = {
             1000: "min",     # 0 градусов
             1500: "mid",     # 90 градусов
             2000: "max"      # 180 градусов
         }
+        self._last_raw = None
+        self._min_name = self.positions[1000]
+        self._mid_name = self.positions[1500]
+        self._max_name = self.positions[2000]
         
-    def parse_channel_values(self, line):
+    @classmethod
+    def parse_channel_values(cls, line):
         """
         Парсинг строки вида: setChannels 1=1858 2=1500 3=1500 ... 16=1500
         Возвращает словарь с значениями каналов
@@ -43,19 +145,9 @@ class CRSFReader:
             if not line.startswith("setChannels"):
                 return channels
             
-            # Разбиваем строку на части
-            parts = line.split()
-            
-            # Первая часть - "setChannels", остальные - каналы
-            for part in parts[1:]:
-                if '=' in part:
-                    channel_str, value_str = part.split('=')
-                    try:
-                        channel = int(channel_str)
-                        value = int(value_str)
-                        channels[channel] = value
-                    except ValueError:
-                        continue
+            # Разбор всех пар одним регулярным выражением
+            for channel_str, value_str in cls._CHANNEL_RE.findall(line):
+                channels[int(channel_str)] = int(value_str)
                         
         except Exception as e:
             print(f"Ошибка парсинга строки: {e}")
@@ -67,25 +159,21 @@ class CRSFReader:
         Чтение файла и получение последнего значения 5-го канала
         """
         try:
-            if not os.path.exists(self.file_path):
+            try:
+                st = os.stat(self.file_path)
+            except FileNotFoundError:
                 return None
+            
+            # Файл не менялся - значение то же
+            signature = stat_signature(st)
+            if signature == self._last_stat:
+                return self._last_ch5
                 
-            with open(self.file_path, 'r') as file:
-                lines = file.readlines()
+            value = _channel_value_in_lines(self._tail.read_lines(st), 5)
             
-            # Ищем последнюю команду setChannels
-            for line in reversed(lines):
-                line = line.strip()
-                if line.startswith("setChannels"):
-                    channels = self.parse_channel_values(line)
-                    
-                    # Возвращаем значение 5-го канала, если оно есть
-                    if 5 in channels:
-                        return channels[5]
-                    else:
-                        return None
-                        
-            return None
+            self._last_stat = signature
+            self._last_ch5 = value
+            return value
             
         except Exception as e:
             print(f"Ошибка при чтении файла: {e}")
@@ -95,34 +183,32 @@ class CRSFReader:
         """
         Преобразование значения CRSF в ближайшую стандартную позицию
         """
-        # Ограничиваем значение
-        crsf_value = max(1000, min(2000, crsf_value))
-        
-        # Определяем ближайшую стандартную позицию
-        closest_pos = min(self.positions.keys(), 
-                         key=lambda x: abs(x - crsf_value))
-        
-        return closest_pos, self.positions[closest_pos]
+        # Ближайшая позиция по порогам посередине между ними
+        # (на границе, как и раньше, выбирается меньшая позиция)
+        if crsf_value <= 1250:
+            return 1000, self._min_name
+        if crsf_value <= 1750:
+            return 1500, self._mid_name
+        return 2000, self._max_name
     
     def set_servo_position(self, position_name):
         """
         Установка сервопривода в указанную позицию
         """
-        if position_name == "min":
-            self.servo.min()
-        elif position_name == "mid":
-            self.servo.mid()
-        elif position_name == "max":
-            self.servo.max()
-        else:
+        pulse_width = self._us.get(position_name)
+        if pulse_width is None:
             print(f"Неизвестная позиция: {position_name}")
+            return
+        self._pi.set_servo_pulsewidth(self._pin, pulse_width)
     
     def process_crsf_value(self, crsf_value):
         """
         Обработка значения CRSF и управление сервоприводом
         """
-        if crsf_value is None:
+        # Значение не изменилось - позиция та же
+        if crsf_value is None or crsf_value == self._last_raw:
             return
+        self._last_raw = crsf_value
             
         # Определяем позицию
         position_value, position_name = self.map_to_position(crsf_value)
@@ -138,6 +224,39 @@ class CRSFReader:
             self.set_servo_position(position_name)
             self.last_position = position_value
     
+    def _open_inotify(self):
+        """
+        Подписка на изменения каталога с файлом команд (None, если inotify недоступен)
+        """
+        if INotify is None:
+            return None
+        try:
+            inotify = INotify()
+            inotify.add_watch(os.path.dirname(self.file_path),
+                              flags.MODIFY | flags.CREATE | flags.MOVED_TO)
+            return inotify
+        except OSError as e:
+            print(f"inotify недоступен ({e}), используется опрос файла")
+            return None
+    
+    def _wait_for_update(self, inotify, update_interval):
+        """
+        Ожидание изменения файла команд
+        """
+        if inotify is None:
+            # Небольшая задержка для снижения нагрузки на CPU
+            time.sleep(update_interval)
+            return
+        
+        # Ядро будит процесс только при записи; раз в секунду проверяем файл в любом случае
+        file_name = os.path.basename(self.file_path)
+        deadline = time.monotonic() + 1.0
+        while True:
+            timeout_ms = int(max(0.0, deadline - time.monotonic()) * 1000)
+            events = inotify.read(timeout=timeout_ms)
+            if not events or any(event.name == file_name for event in events):
+                return
+    
     def run(self, update_interval=0.1):
         """
         Основной цикл программы
@@ -146,7 +265,7 @@ class CRSFReader:
         print("CRSF Reader и Servo Controller")
         print("=" * 60)
         print(f"Чтение файла: {self.file_path}")
-        print(f"Управление сервоприводом на пине GPIO {self.servo.pin}")
+        print(f"Управление сервоприводом на пине GPIO {self._pin}")
         print("Ожидание команд формата:")
         print("  setChannels 1=1858 2=1500 3=1500 ... 5=XXX ... 16=1500")
         print("\nДиапазон значений для канала 5:")
@@ -156,6 +275,8 @@ class CRSFReader:
         print("=" * 60)
         print("Нажмите Ctrl+C для выхода\n")
         
+        inotify = self._open_inotify()
+        
         try:
             while True:
                 # Получаем значение 5-го канала
@@ -164,16 +285,21 @@ class CRSFReader:
                 # Обрабатываем значение
                 self.process_crsf_value(crsf_value)
                 
-                # Небольшая задержка для снижения нагрузки на CPU
-                time.sleep(update_interval)
+                # Ждем следующей записи в файл
+                self._wait_for_update(inotify, update_interval)
                 
         except KeyboardInterrupt:
             print("\n" + "=" * 60)
             print("Выход из программы")
             print("Отключаем сервопривод...")
-            self.servo.value = None  # Отключаем сервопривод
+            self._pi.set_servo_pulsewidth(self._pin, 0)  # Отключаем сервопривод
             print("Программа завершена")
             print("=" * 60)
+        finally:
+            self._pi.stop()
+            self._tail.close()
+            if inotify is not None:
+                inotify.close()
 
 # Упрощенная версия для тестирования
 class SimpleCRSFReader:
@@ -181,28 +307,19 @@ class SimpleCRSFReader:
         """
         Упрощенная версия без pigpio
         """
+        from gpiozero import Servo
+        
         self.servo = Servo(servo_pin)
+        self._dispatch = {
+            "min": self.servo.min,
+            "mid": self.servo.mid,
+            "max": self.servo.max,
+        }
         self.file_path = "/tmp/crsf_command.txt"
         self.last_value = None
+        self._last_stat = None
+        self._tail = TailReader(self.file_path)
         
-    def parse_line(self, line):
-        """
-        Парсинг строки с каналами
-        """
-        if not line.startswith("setChannels"):
-            return None
-            
-        # Ищем значение 5-го канала
-        parts = line.split()
-        for part in parts:
-            if part.startswith('5='):
-                try:
-                    value = int(part.split('=')[1])
-                    return value
-                except ValueError:
-                    return None
-        return None
-    
     def run(self):
         print("Простая версия CRSF Reader")
         print("Ожидание команд в формате setChannels...")
@@ -211,32 +328,26 @@ class SimpleCRSFReader:
             while True:
                 # Читаем файл
                 try:
-                    with open(self.file_path, 'r') as f:
-                        lines = f.readlines()
+                    # Файл не менялся - перечитывать нечего
+                    st = os.stat(self.file_path)
+                    signature = stat_signature(st)
+                    if signature == self._last_stat:
+                        time.sleep(0.1)
+                        continue
+                    self._last_stat = signature
+                    
+                    # Значение 5-го канала из последней команды setChannels
+                    value = _channel_value_in_lines(self._tail.read_lines(st), 5)
+                    
+                    # Проверяем изменилось ли значение
+                    if value is not None and self.last_value != value:
+                        self.last_value = value
                         
-                    # Ищем последнюю команду setChannels
-                    for line in reversed(lines):
-                        line = line.strip()
-                        if line.startswith("setChannels"):
-                            value = self.parse_line(line)
-                            
-                            if value is not None:
-                                # Проверяем изменилось ли значение
-                                if self.last_value != value:
-                                    self.last_value = value
-                                    
-                                    # Устанавливаем позицию сервопривода
-                                    if 1000 <= value <= 1333:
-                                        print(f"Канал 5: {value} -> servo.min()")
-                                        self.servo.min()
-                                    elif 1334 <= value <= 1666:
-                                        print(f"Канал 5: {value} -> servo.mid()")
-                                        self.servo.mid()
-                                    elif 1667 <= value <= 2000:
-                                        print(f"Канал 5: {value} -> servo.max()")
-                                        self.servo.max()
-                                    
-                                break
+                        # Устанавливаем позицию сервопривода (1000-1333 / 1334-1666 / 1667-2000)
+                        if 1000 <= value <= 2000:
+                            name = "min" if value <= 1333 else ("mid" if value <= 1666 else "max")
+                            print(f"Канал 5: {value} -> servo.{name}()")
+                            self._dispatch[name]()
                 except FileNotFoundError:
                     if self.last_value is None:
                         print(f"Ожидание файла: {self.file_path}")
@@ -249,6 +360,8 @@ class SimpleCRSFReader:
         except KeyboardInterrupt:
             print("\nОтключаем сервопривод...")
             self.servo.value = None
+        finally:
+            self._tail.close()
 
 # Функция для мониторинга всех каналов
 def monitor_crsf_channels():
@@ -270,8 +383,8 @@ def monitor_crsf_channels():
                 for line in reversed(lines):
                     line = line.strip()
                     if line.startswith("setChannels"):
-                        print("\n" + time.strftime("%H:%M:%S"))
-                        print("-" * 40)
+                        # Собираем вывод целиком и пишем одним вызовом
+                        out = ["", time.strftime("%H:%M:%S"), "-" * 40]
                         
                         # Парсим все каналы
                         parts = line.split()
@@ -283,10 +396,12 @@ def monitor_crsf_channels():
                                 
                                 # Выделяем 5-й канал цветом
                                 if channel_num == 5:
-                                    print(f"\033[92mКанал {chan}: {value}\033[0m ← УПРАВЛЕНИЕ")
+                                    out.append(f"\033[92mКанал {chan}: {value}\033[0m ← УПРАВЛЕНИЕ")
                                 else:
-                                    print(f"Канал {chan}: {value}")
+                                    out.append(f"Канал {chan}: {value}")
                         
+                        sys.stdout.write("\n".join(out) + "\n")
+                        sys.stdout.flush()
                         break
                         
             except FileNotFoundError:
@@ -312,25 +427,23 @@ def test_parser():
         "setChannels 5=1800 6=1200 7=1500",
     ]
     
-    reader = CRSFReader()
-    
-    print("Тест парсера команд:")
-    print("=" * 60)
+    out = ["Тест парсера команд:", "=" * 60]
     
     for line in test_lines:
-        print(f"\nСтрока: {line}")
+        out.append(f"\nСтрока: {line}")
         if line.startswith("setChannels"):
-            channels = reader.parse_channel_values(line)
-            print(f"Распарсенные каналы: {channels}")
+            # Разбор не требует сервопривода - экземпляр CRSFReader не создаем
+            channels = CRSFReader.parse_channel_values(line)
+            out.append(f"Распарсенные каналы: {channels}")
             if 5 in channels:
-                print(f"Канал 5: {channels[5]}")
+                out.append(f"Канал 5: {channels[5]}")
         else:
-            print("Пропуск (не setChannels)")
+            out.append("Пропуск (не setChannels)")
+    
+    sys.stdout.write("\n".join(out) + "\n")
 
 # Основная программа
 if __name__ == "__main__":
-    import sys
-    
     print("CRSF Reader and Servo Controller")
     print("Версия 3.0 (поддержка формата setChannels)")
     print()
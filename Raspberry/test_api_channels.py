@@ -1,159 +1,259 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-Тест установки каналов через API
-"""
-
-import sys
-import time
-import requests
-
-def test_api_channels():
-    """Тест установки каналов через API"""
-    
-    api_url = "http://localhost:8081"
-    
-    print("=" * 60)
-    print("Тест установки каналов через API")
-    print("=" * 60)
-    print()
-    
-    print(f"Подключение к API серверу: {api_url}")
-    
-    # Проверка доступности API сервера
-    try:
-        response = requests.get(f"{api_url}/", timeout=2)
-        print("[OK] API сервер доступен")
-    except requests.exceptions.ConnectionError:
-        print("[ERROR] Не удалось подключиться к API серверу")
-        print("Убедитесь, что API сервер запущен:")
-        print("  ./crsf_api_server 8081 <IP> 8082")
-        return 1
-    except Exception as e:
-        print(f"[ERROR] Ошибка подключения: {e}")
-        return 1
-    
-    print()
-    
-    # Установка режима manual
-    print("1. Установка режима 'manual'...")
-    try:
-        print(f"   Отправка POST запроса на {api_url}/api/command/setMode...")
-        response = requests.post(
-            f"{api_url}/api/command/setMode",
-            json={"mode": "manual"},
-            timeout=10
-        )
-        print(f"   Статус ответа: {response.status_code}")
-        print(f"   Содержимое ответа: {response.text[:200]}")
-        response.raise_for_status()
-        result = response.json()
-        if result.get('status') == 'ok':
-            print("   [OK] Режим 'manual' установлен")
-        else:
-            print(f"   [ERROR] Ошибка: {result.get('message', 'Unknown error')}")
-            return 1
-    except requests.exceptions.Timeout as e:
-        print(f"   [ERROR] Таймаут запроса: {e}")
-        print("   Возможно, API интерпретатор не запущен или не отвечает")
-        return 1
-    except Exception as e:
-        print(f"   [ERROR] Ошибка установки режима: {e}")
-        import traceback
-        traceback.print_exc()
-        return 1
-    
-    time.sleep(0.2)
-    print()
-    
-    # Установка отдельных каналов
-    print("2. Установка отдельных каналов...")
-    test_channels = [
-        (1, 1500),  # Roll - центр
-        (2, 1000),  # Pitch - минимум
-        (3, 2000),  # Throttle - максимум
-        (4, 1500),  # Yaw - центр
-    ]
-    
-    for channel, value in test_channels:
-        try:
-            response = requests.post(
-                f"{api_url}/api/command/setChannel",
-                json={"channel": channel, "value": value},
-                timeout=10
-            )
-            response.raise_for_status()
-            result = response.json()
-            if result.get('status') == 'ok':
-                print(f"   [OK] CH{channel} = {value}")
-            else:
-                print(f"   [ERROR] CH{channel}: {result.get('message', 'Unknown error')}")
-        except Exception as e:
-            print(f"   [ERROR] CH{channel}: {e}")
-    
-    time.sleep(0.2)
-    print()
-    
-    # Установка всех каналов одновременно
-    print("3. Установка всех 16 каналов одновременно...")
-    all_channels = [1500] * 16
-    all_channels[0] = 1200  # CH1
-    all_channels[1] = 1800  # CH2
-    all_channels[2] = 1000  # CH3 (Throttle минимум)
-    all_channels[3] = 1500  # CH4
-    
-    try:
-        response = requests.post(
-            f"{api_url}/api/command/setChannels",
-            json={"channels": all_channels},
-            timeout=10
-        )
-        response.raise_for_status()
-        result = response.json()
-        if result.get('status') == 'ok':
-            print("   [OK] Все каналы установлены")
-            print(f"   CH1={all_channels[0]}, CH2={all_channels[1]}, CH3={all_channels[2]}, CH4={all_channels[3]}")
-        else:
-            print(f"   [ERROR] Ошибка: {result.get('message', 'Unknown error')}")
-            return 1
-    except Exception as e:
-        print(f"   [ERROR] Ошибка установки каналов: {e}")
-        return 1
-    
-    time.sleep(0.2)
-    print()
-    
-    # Отправка каналов
-    print("4. Отправка каналов...")
-    try:
-        response = requests.post(
-            f"{api_url}/api/command/sendChannels",
-            json={},
-            timeout=10
-        )
-        response.raise_for_status()
-        result = response.json()
-        if result.get('status') == 'ok':
-            print("   [OK] Каналы отправлены")
-        else:
-            print(f"   [ERROR] Ошибка: {result.get('message', 'Unknown error')}")
-            return 1
-    except Exception as e:
-        print(f"   [ERROR] Ошибка отправки каналов: {e}")
-        return 1
-    
-    print()
-    print("=" * 60)
-    print("Все тесты пройдены успешно!")
-    print("=" * 60)
-    
-    return 0
-
-
-if __name__ == "__main__":
-    try:
-        exit_code = test_api_channels()
-        sys.exit(exit_code)
-    except KeyboardInterrupt:
-        print("\n\nТест прерван пользователем (Ctrl+C)")
-        sys.exit(1)
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест установки каналов через API
+"""
+
+import sys
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+    json_loads = json.loads
+
+# Одна сессия на все запросы теста
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0))
+SESSION.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+
+
+def _post_with_retry(url, json=None, data=None, timeout=10, max_retries=3, base=0.2):
+    """
+    POST с повтором при таймауте или обрыве соединения
+    
+    Тело кодируется один раз (json) или передается готовыми байтами (data).
+    Задержка между попытками растет экспоненциально (с джиттером, не более 2 с).
+    Ошибки HTTP (4xx/5xx) не повторяются - их проверяет raise_for_status().
+    """
+    if data is None:
+        data = json_dumps(json)
+    for attempt in range(max_retries):
+        try:
+            return SESSION.post(url, data=data, timeout=timeout)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if attempt == max_retries - 1:
+                raise
+            time.sleep(min(2.0, base * 2 ** attempt * (1 + random.random() * 0.5)))
+
+
+def test_api_channels(per_channel=False):
+    """Тест установки каналов через API"""
+    with SESSION:
+        return _run_test(per_channel)
+
+
+def _set_channels_batch(api_url, test_channels):
+    """Устанавливает тестовые каналы одним запросом setChannels"""
+    channels = [1500] * 16
+    for channel, value in test_channels:
+        channels[channel - 1] = value
+    
+    try:
+        response = _post_with_retry(
+            f"{api_url}/api/command/setChannels",
+            json={"channels": channels},
+            timeout=10
+        )
+        response.raise_for_status()
+        result = json_loads(response.content)
+    except Exception as e:
+        for channel, value in test_channels:
+            print(f"   [ERROR] CH{channel}: {e}")
+        return
+    
+    for channel, value in test_channels:
+        if result.get('status') == 'ok':
+            print(f"   [OK] CH{channel} = {value}")
+        else:
+            print(f"   [ERROR] CH{channel}: {result.get('message', 'Unknown error')}")
+
+
+def _set_channel(api_url, channel, value, body):
+    """Один запрос setChannel с готовым телом, возвращает строку результата"""
+    try:
+        response = _post_with_retry(
+            f"{api_url}/api/command/setChannel",
+            data=body,
+            timeout=10
+        )
+        response.raise_for_status()
+        result = json_loads(response.content)
+        if result.get('status') == 'ok':
+            return f"   [OK] CH{channel} = {value}"
+        return f"   [ERROR] CH{channel}: {result.get('message', 'Unknown error')}"
+    except Exception as e:
+        return f"   [ERROR] CH{channel}: {e}"
+
+
+def _set_channels_each(api_url, test_channels):
+    """Устанавливает тестовые каналы по одному через setChannel
+    
+    Запросы независимы, поэтому идут параллельно (по размеру пула сессии);
+    результаты выводятся в исходном порядке.
+    """
+    # Один словарь на все запросы; тела кодируются до отправки в потоки
+    payload = {"channel": 0, "value": 0}
+    bodies = []
+    for channel, value in test_channels:
+        payload["channel"] = channel
+        payload["value"] = value
+        bodies.append(json_dumps(payload))
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        lines = executor.map(lambda args: _set_channel(api_url, *args[0], args[1]),
+                             zip(test_channels, bodies))
+        for line in lines:
+            print(line)
+
+
+def _run_test(per_channel):
+    api_url = "http://localhost:8081"
+    
+    print("=" * 60)
+    print("Тест установки каналов через API")
+    print("=" * 60)
+    print()
+    
+    print(f"Подключение к API серверу: {api_url}")
+    
+    # Проверка доступности API сервера
+    try:
+        response = SESSION.get(f"{api_url}/", timeout=2)
+        print("[OK] API сервер доступен")
+    except requests.exceptions.ConnectionError:
+        print("[ERROR] Не удалось подключиться к API серверу")
+        print("Убедитесь, что API сервер запущен:")
+        print("  ./crsf_api_server 8081 <IP> 8082")
+        return 1
+    except Exception as e:
+        print(f"[ERROR] Ошибка подключения: {e}")
+        return 1
+    
+    print()
+    
+    # Установка режима manual
+    print("1. Установка режима 'manual'...")
+    try:
+        print(f"   Отправка POST запроса на {api_url}/api/command/setMode...")
+        response = _post_with_retry(
+            f"{api_url}/api/command/setMode",
+            json={"mode": "manual"},
+            timeout=10
+        )
+        print(f"   Статус ответа: {response.status_code}")
+        print(f"   Содержимое ответа: {response.text[:200]}")
+        response.raise_for_status()
+        result = json_loads(response.content)
+        if result.get('status') == 'ok':
+            print("   [OK] Режим 'manual' установлен")
+        else:
+            print(f"   [ERROR] Ошибка: {result.get('message', 'Unknown error')}")
+            return 1
+    except requests.exceptions.Timeout as e:
+        print(f"   [ERROR] Таймаут запроса: {e}")
+        print("   Возможно, API интерпретатор не запущен или не отвечает")
+        return 1
+    except Exception as e:
+        print(f"   [ERROR] Ошибка установки режима: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    
+    print()
+    
+    # Установка отдельных каналов
+    print("2. Установка отдельных каналов...")
+    test_channels = [
+        (1, 1500),  # Roll - центр
+        (2, 1000),  # Pitch - минимум
+        (3, 2000),  # Throttle - максимум
+        (4, 1500),  # Yaw - центр
+    ]
+    
+    # По умолчанию один запрос вместо запроса на каждый канал;
+    # --per-channel проверяет команду setChannel по отдельности
+    if per_channel:
+        _set_channels_each(api_url, test_channels)
+    else:
+        _set_channels_batch(api_url, test_channels)
+    
+    print()
+    
+    # Установка всех каналов одновременно
+    print("3. Установка всех 16 каналов одновременно...")
+    all_channels = [1500] * 16
+    all_channels[0] = 1200  # CH1
+    all_channels[1] = 1800  # CH2
+    all_channels[2] = 1000  # CH3 (Throttle минимум)
+    all_channels[3] = 1500  # CH4
+    
+    try:
+        response = _post_with_retry(
+            f"{api_url}/api/command/setChannels",
+            json={"channels": all_channels},
+            timeout=10
+        )
+        response.raise_for_status()
+        result = json_loads(response.content)
+        if result.get('status') == 'ok':
+            print("   [OK] Все каналы установлены")
+            print(f"   CH1={all_channels[0]}, CH2={all_channels[1]}, CH3={all_channels[2]}, CH4={all_channels[3]}")
+        else:
+            print(f"   [ERROR] Ошибка: {result.get('message', 'Unknown error')}")
+            return 1
+    except Exception as e:
+        print(f"   [ERROR] Ошибка установки каналов: {e}")
+        return 1
+    
+    print()
+    
+    # Отправка каналов
+    print("4. Отправка каналов...")
+    try:
+        response = _post_with_retry(
+            f"{api_url}/api/command/sendChannels",
+            json={},
+            timeout=10
+        )
+        response.raise_for_status()
+        result = json_loads(response.content)
+        if result.get('status') == 'ok':
+            print("   [OK] Каналы отправлены")
+        else:
+            print(f"   [ERROR] Ошибка: {result.get('message', 'Unknown error')}")
+            return 1
+    except Exception as e:
+        print(f"   [ERROR] Ошибка отправки каналов: {e}")
+        return 1
+    
+    print()
+    print("=" * 60)
+    print("Все тесты пройдены успешно!")
+    print("=" * 60)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Тест установки каналов через API")
+    parser.add_argument("--per-channel", action="store_true",
+                        help="Шаг 2: отдельный запрос setChannel на каждый канал")
+    args = parser.parse_args()
+    
+    try:
+        exit_code = test_api_channels(args.per_channel)
+        sys.exit(exit_code)
+    except KeyboardInterrupt:
+        print("\n\nТест прерван пользователем (Ctrl+C)")
+        sys.exit(1)